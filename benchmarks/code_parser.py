@@ -0,0 +1,113 @@
+"""
+Benchmark of the `~~~` / `File:` response parsers.
+
+Compares the line-splitting parser the code agents used to carry with
+`src.services.code_parser`, on a whole response and on the same response fed
+as a token stream. Run from the repository root:
+
+    python benchmarks/code_parser.py [size_kb ...]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.code_parser import CodeParser, parse_code_response
+
+REPEAT = 5
+TOKEN_SIZE = 4
+
+
+def legacy_parse(response: str):
+    response = response.strip()
+
+    response = response.split("~~~", 1)[1]
+    response = response[:response.rfind("~~~")]
+    response = response.strip()
+
+    result = []
+    current_file = None
+    current_code = []
+    code_block = False
+
+    for line in response.split("\n"):
+        if line.startswith("File: "):
+            if current_file and current_code:
+                result.append({"file": current_file, "code": "\n".join(current_code)})
+            current_file = line.split("`")[1].strip()
+            current_code = []
+            code_block = False
+        elif line.startswith("```"):
+            code_block = not code_block
+        else:
+            current_code.append(line)
+
+    if current_file and current_code:
+        result.append({"file": current_file, "code": "\n".join(current_code)})
+
+    return result
+
+
+def make_response(size_kb: int) -> str:
+    rng = random.Random(size_kb)
+    blocks = []
+    size = 0
+    index = 0
+    while size < size_kb * 1024:
+        lines = [
+            f"    value_{i} = compute({rng.randint(0, 10 ** 6)}, '{'x' * rng.randint(0, 40)}')"
+            for i in range(rng.randint(20, 200))
+        ]
+        block = f"File: `src/module_{index}.py`:\n```py\ndef handler_{index}():\n" + "\n".join(lines) + "\n```\n"
+        blocks.append(block)
+        size += len(block)
+        index += 1
+    return "~~~\n" + "\n".join(blocks) + "~~~"
+
+
+def tokens(response: str):
+    return [response[i:i + TOKEN_SIZE] for i in range(0, len(response), TOKEN_SIZE)]
+
+
+def stream_parse(chunks):
+    parser = CodeParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser.files
+
+
+def best_of(func, *args) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes):
+    print(f"{'size':>8} {'files':>6} {'legacy':>10} {'single pass':>12} {'streamed':>10} {'bytes':>10}")
+    for size_kb in sizes:
+        response = make_response(size_kb)
+        chunks = tokens(response)
+        encoded = memoryview(response.encode("utf-8"))
+
+        # The legacy parser also kept the blank lines between blocks
+        expected = [(file["file"], file["code"].rstrip("\n")) for file in legacy_parse(response)]
+        assert [(file["file"], file["code"]) for file in parse_code_response(response)] == expected
+        assert stream_parse(chunks) == expected
+
+        print(
+            f"{size_kb:>6}KB {len(expected):>6} "
+            f"{best_of(legacy_parse, response) * 1000:>8.2f}ms "
+            f"{best_of(parse_code_response, response) * 1000:>10.2f}ms "
+            f"{best_of(stream_parse, chunks) * 1000:>8.2f}ms "
+            f"{best_of(parse_code_response, encoded) * 1000:>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 300, 800])
@@ -22,7 +22,9 @@ from src.logger import Logger, route_logger
 from src.project import ProjectManager
 from src.state import AgentState
 from src.agents import Agent
-from src.llm import LLM
+from src.llm import LLM, LLMError, token_counter
+from src.llm.cache import ResponseCache
+from src.services.utils import InvalidResponseError
 
 
 app = Flask(__name__)
@@ -65,8 +67,17 @@ def data():
 def get_messages():
     data = request.json
     project_name = data.get("project_name")
-    messages = manager.get_messages(project_name)
-    return jsonify({"messages": messages})
+    try:
+        before = int(data["before"]) if data.get("before") is not None else None
+        limit = int(data["limit"]) if data.get("limit") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "before and limit must be integers"}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+    messages = manager.get_messages(project_name, before=before, limit=limit)
+    # cursor for the next (older) page, only when a page size was requested
+    next_cursor = messages[0]["id"] if limit and len(messages) == limit else None
+    return jsonify({"messages": messages, "next_cursor": next_cursor})
 
 
 # Main socket
@@ -78,24 +89,38 @@ def handle_message(data):
     project_name = data.get('project_name')
     search_engine = data.get('search_engine').lower()
 
+    if manager.is_waiting_for_user(project_name):
+        # an agent asked the user something, hand it the reply instead of starting a new run
+        manager.add_message_from_user(project_name, message)
+        return
+
     agent = Agent(base_model=base_model, search_engine=search_engine)
 
+    def run_agent(run):
+        try:
+            run(message, project_name)
+        except (LLMError, InvalidResponseError) as e:
+            # the model or every fallback failed: stop this run, keep the server up
+            logger.error(f"Agent stopped: {e}")
+            emit_agent("info", {"type": "error", "message": str(e)})
+            AgentState.set_agent_active(project_name, False)
+
     state = AgentState.get_latest_state(project_name)
     if not state:
-        thread = Thread(target=lambda: agent.execute(message, project_name))
+        thread = Thread(target=run_agent, args=(agent.execute,))
         thread.start()
     else:
         if AgentState.is_agent_completed(project_name):
-            thread = Thread(target=lambda: agent.subsequent_execute(message, project_name))
+            thread = Thread(target=run_agent, args=(agent.subsequent_execute,))
             thread.start()
         else:
             emit_agent("info", {"type": "warning", "message": "previous agent doesn't completed it's task."})
             last_state = AgentState.get_latest_state(project_name)
             if last_state["agent_is_active"] or not last_state["completed"]:
-                thread = Thread(target=lambda: agent.execute(message, project_name))
+                thread = Thread(target=run_agent, args=(agent.execute,))
                 thread.start()
             else:
-                thread = Thread(target=lambda: agent.subsequent_execute(message, project_name))
+                thread = Thread(target=run_agent, args=(agent.subsequent_execute,))
                 thread.start()
 
 @app.route("/api/is-agent-active", methods=["POST"])
@@ -113,7 +138,18 @@ def get_agent_state():
     data = request.json
     project_name = data.get("project_name")
     agent_state = AgentState.get_latest_state(project_name)
-    return jsonify({"state": agent_state})
+    seq = AgentState.get_latest_seq(project_name)
+    return jsonify({"state": agent_state, "seq": seq})
+
+
+@app.route("/api/get-agent-state-since", methods=["POST"])
+@route_logger(logger)
+def get_agent_state_since():
+    data = request.json
+    project_name = data.get("project_name")
+    since_seq = int(data.get("since_seq", 0))
+    entries = AgentState.get_states_since(project_name, since_seq)
+    return jsonify({"entries": entries})
 
 
 @app.route("/api/get-project-files/", methods=["GET"])
@@ -178,10 +214,16 @@ def calculate_tokens():
 @route_logger(logger)
 def token_usage():
     project_name = request.args.get("project_name")
-    token_count = AgentState.get_latest_token_usage(project_name)
+    token_count = token_counter.total(project_name)
     return jsonify({"token_usage": token_count})
 
 
+@app.route("/api/llm-cache-stats", methods=["GET"])
+@route_logger(logger)
+def llm_cache_stats():
+    return jsonify({"stats": ResponseCache().stats()})
+
+
 @app.route("/api/logs", methods=["GET"])
 def real_time_logs():
     log_file = logger.read_log_file()
@@ -4,10 +4,20 @@ from jinja2 import Environment, BaseLoader
 
 from src.services.utils import retry_wrapper, validate_responses
 from src.config import Config
-from src.llm import LLM
+from src.llm import LLM, PRIORITY_HIGH
 
 PROMPT = open("src/agents/action/prompt.jinja2", "r").read().strip()
 
+RESPONSE_SCHEMA = {
+    "title": "action",
+    "type": "object",
+    "properties": {
+        "response": {"type": "string"},
+        "action": {"type": "string", "enum": ["answer", "run", "deploy", "feature", "bug", "report"]}
+    },
+    "required": ["response", "action"]
+}
+
 class Action:
     def __init__(self, base_model: str):
         config = Config()
@@ -34,7 +44,8 @@ class Action:
     @retry_wrapper
     def execute(self, conversation: list, project_name: str) -> str:
         prompt = self.render(conversation)
-        response = self.llm.inference(prompt, project_name)
+        response = self.llm.inference(prompt, project_name, schema=RESPONSE_SCHEMA,
+                                      priority=PRIORITY_HIGH)
         
         valid_response = self.validate_response(response)
         
@@ -11,21 +11,24 @@ from .patcher import Patcher
 from .reporter import Reporter
 from .decision import Decision
 
+from src.config import Config
 from src.project import ProjectManager
 from src.state import AgentState
 from src.logger import Logger
 
 from src.bert.sentence import SentenceBert
-from src.memory import KnowledgeBase
+from src.memory import KnowledgeBase, get_vector_index
 from src.browser.search import BingSearch, GoogleSearch, DuckDuckGoSearch
-from src.browser import Browser
+from src.browser import Browser, get_browser_pool
+from src.browser.fetch import fetch_static_text
 from src.browser import start_interaction
-from src.filesystem import ReadCode
+from src.filesystem import ContextBuilder
+from src.filesystem.file_index import get_file_index
 from src.services import Netlify
 from src.documenter.pdf import PDF
 
+import os
 import json
-import time
 import platform
 import tiktoken
 import asyncio
@@ -64,64 +67,147 @@ class Agent:
         self.project_manager = ProjectManager()
         self.agent_state = AgentState()
         self.engine = search_engine
+        self.base_model = base_model
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
 
-    async def open_page(self, project_name, url):
-        browser = await Browser().start()
+    async def open_page(self, project_name, url, fast=False):
+        """
+        With `fast`, load only what is needed for the page text and take a cheap
+        screenshot, or none when screenshots are turned off.
+        """
+        async with get_browser_pool().lease() as page:
+            browser = Browser(page)
 
-        await browser.go_to(url)
-        _, raw = await browser.screenshot(project_name)
-        data = await browser.extract_text()
-        await browser.close()
+            await browser.go_to(url, fast=fast)
+            if fast and not Config().get_browser_screenshots():
+                raw = None
+            else:
+                _, raw = await browser.screenshot(project_name, fast=fast)
+            data = await browser.extract_text()
 
         return browser, raw, data
 
-    def search_queries(self, queries: list, project_name: str) -> dict:
-        results = {}
-
-        knowledge_base = KnowledgeBase()
-
+    def new_web_search(self):
         if self.engine == "bing":
-            web_search = BingSearch()
+            return BingSearch()
         elif self.engine == "google":
-            web_search = GoogleSearch()
+            return GoogleSearch()
         else:
-            web_search = DuckDuckGoSearch()
-
-        self.logger.info(f"\nSearch Engine :: {self.engine}")
+            return DuckDuckGoSearch()
 
-        for query in queries:
-            query = query.strip().lower()
-
-            # knowledge = knowledge_base.get_knowledge(tag=query)
-            # if knowledge:
-            #     results[query] = knowledge
-            #     continue
-
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    async def search_query(self, query: str, project_name: str, semaphore: asyncio.Semaphore):
+        """
+        Search, browse and format a single query. Blocking steps (search HTTP call,
+        formatter inference) run in worker threads so queries overlap each other.
+        """
+        async with semaphore:
+            config = Config()
+            knowledge_base = KnowledgeBase()
+            if config.get_research_cache():
+                knowledge = knowledge_base.search_knowledge(
+                    query,
+                    ttl=config.get_research_cache_ttl(),
+                    min_relevance=config.get_research_cache_min_relevance()
+                )
+                if knowledge:
+                    self.logger.info(f"using cached research results for : {query}")
+                    return knowledge
 
-            web_search.search(query)
+            # search engines keep the last result on the instance, so one per query
+            web_search = self.new_web_search()
+            await asyncio.to_thread(web_search.search, query)
 
             link = web_search.get_first_link()
             print("\nLink :: ", link, '\n')
             if not link:
-                continue
-            browser, raw, data = loop.run_until_complete(self.open_page(project_name, link))
-            emit_agent("screenshot", {"data": raw, "project_name": project_name}, False)
-            results[query] = self.formatter.execute(data, project_name)
-
+                return None
+
+            fast = config.get_browser_fast_fetch()
+            data = None
+            if fast and config.get_browser_http_fallback():
+                data = await asyncio.to_thread(fetch_static_text, link)
+            if data:
+                new_state = self.agent_state.new_state()
+                new_state["internal_monologue"] = "Browsing the web right now..."
+                new_state["browser_session"]["url"] = link
+                self.agent_state.add_to_current_state(project_name, new_state)
+            else:
+                browser, raw, data = await self.open_page(project_name, link, fast=fast)
+                if raw:
+                    emit_agent("screenshot", {"data": raw, "project_name": project_name}, False)
+
+            result = await asyncio.to_thread(self.formatter.execute, data, project_name)
             self.logger.info(f"got the search results for : {query}")
-            # knowledge_base.add_knowledge(tag=query, contents=results[query])
+            if config.get_research_cache() and result:
+                knowledge_base.add_knowledge(tag=query, contents=result)
+            return result
+
+    async def research(self, queries: list, project_name: str) -> dict:
+        semaphore = asyncio.Semaphore(Config().get_research_max_concurrency())
+        queries = [query.strip().lower() for query in queries]
+
+        outcomes = await asyncio.gather(
+            *[self.search_query(query, project_name, semaphore) for query in queries],
+            return_exceptions=True
+        )
+
+        results = {}
+        for query, outcome in zip(queries, outcomes):
+            if isinstance(outcome, BaseException):
+                self.logger.error(f"search failed for : {query} :: {outcome}")
+            elif outcome:
+                results[query] = outcome
         return results
 
-    def update_contextual_keywords(self, sentence: str):
+    def search_queries(self, queries: list, project_name: str) -> dict:
+        self.logger.info(f"\nSearch Engine :: {self.engine}")
+        # the pipeline runs on the browser pool's loop, which owns the shared Chromium
+        return get_browser_pool().run(self.research(queries, project_name))
+
+    def index_project(self, project_name: str, context_builder: ContextBuilder = None):
         """
-            Update the context keywords with the latest sentence/prompt
+        Bring the project's vector index in sync with the files the context is
+        built from (gitignore, lockfile, size and binary filters included). Only
+        files whose mtime or size changed since the last sync are re-chunked;
+        sources are paths relative to the project.
         """
-        keywords = SentenceBert(sentence).extract_keywords()
-        for keyword in keywords:
-            self.collected_context_keywords.append(keyword[0])
+        index = get_vector_index(project_name)
+        context_builder = context_builder or ContextBuilder(project_name)
+        file_index = get_file_index(context_builder.directory_path)
+        stamps = {}
+        for path in context_builder.candidate_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            source = os.path.relpath(path, context_builder.directory_path)
+            stamps[source] = (os.path.abspath(path), (stat.st_mtime_ns, stat.st_size))
+
+        first_sync = not index.file_stamps
+        for source, (path, stamp) in stamps.items():
+            if index.file_stamps.get(source) == stamp:
+                continue
+            code = file_index.read(path)
+            if code is None:
+                index.remove_source(source)
+            else:
+                index.sync_source(source, code)
+            index.file_stamps[source] = stamp
+
+        # the first sync of the process also drops the files an earlier run indexed
+        known = index.sources() if first_sync else set(index.file_stamps)
+        for source in known - set(stamps):
+            index.file_stamps.pop(source, None)
+            index.remove_source(source)
+        return index
+
+    def update_contextual_keywords(self, *sentences: str):
+        """
+            Update the context keywords with the latest sentences/prompts
+        """
+        for keywords in SentenceBert.extract_keywords_batch(list(sentences)):
+            for keyword in keywords:
+                self.collected_context_keywords.append(keyword[0])
 
         return self.collected_context_keywords
 
@@ -190,7 +276,9 @@ class Agent:
         self.agent_state.set_agent_active(project_name, True)
 
         conversation = self.project_manager.get_all_messages_formatted(project_name)
-        code_markdown = ReadCode(project_name).code_set_to_markdown()
+        context_builder = ContextBuilder(project_name, self.base_model)
+        index = self.index_project(project_name, context_builder) if Config().get_rag_enabled() else None
+        code_markdown = context_builder.build(conversation, index=index)
 
         response, action = self.action.execute(conversation, project_name)
 
@@ -323,20 +411,16 @@ class Agent:
         if ask_user != "" and ask_user is not None:
             self.project_manager.add_message_from_devika(project_name, ask_user)
             self.agent_state.set_agent_active(project_name, False)
-            got_user_query = False
-
-            while not got_user_query:
-                self.logger.info("Waiting for user query...")
 
-                latest_message_from_user = self.project_manager.get_latest_message_from_user(project_name)
-                validate_last_message_is_from_user = self.project_manager.validate_last_message_is_from_user(
-                    project_name)
+            self.logger.info("Waiting for user query...")
+            latest_message_from_user = self.project_manager.wait_for_user_message(
+                project_name, timeout=Config().get_timeout_user_reply())
 
-                if latest_message_from_user and validate_last_message_is_from_user:
-                    ask_user_prompt = latest_message_from_user["message"]
-                    got_user_query = True
-                    self.project_manager.add_message_from_devika(project_name, "Thanks! 🙌")
-                time.sleep(5)
+            if latest_message_from_user:
+                ask_user_prompt = latest_message_from_user["message"]
+                self.project_manager.add_message_from_devika(project_name, "Thanks! 🙌")
+            else:
+                self.logger.info("No reply from the user, proceeding without it.")
 
         self.agent_state.set_agent_active(project_name, True)
 
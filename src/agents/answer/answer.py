@@ -4,10 +4,19 @@ from jinja2 import Environment, BaseLoader
 
 from src.services.utils import retry_wrapper, validate_responses
 from src.config import Config
-from src.llm import LLM
+from src.llm import LLM, PRIORITY_HIGH
 
 PROMPT = open("src/agents/answer/prompt.jinja2", "r").read().strip()
 
+RESPONSE_SCHEMA = {
+    "title": "answer",
+    "type": "object",
+    "properties": {
+        "response": {"type": "string"}
+    },
+    "required": ["response"]
+}
+
 class Answer:
     def __init__(self, base_model: str):
         config = Config()
@@ -35,7 +44,8 @@ class Answer:
     @retry_wrapper
     def execute(self, conversation: list, code_markdown: str, project_name: str) -> str:
         prompt = self.render(conversation, code_markdown)
-        response = self.llm.inference(prompt, project_name)
+        response = self.llm.inference(prompt, project_name, schema=RESPONSE_SCHEMA,
+                                      priority=PRIORITY_HIGH)
         
         valid_response = self.validate_response(response)
         
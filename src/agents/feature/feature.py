@@ -1,14 +1,13 @@
 import os
-import time
 
 from jinja2 import Environment, BaseLoader
 from typing import List, Dict, Union
 
 from src.config import Config
 from src.llm import LLM
-from src.state import AgentState
 from src.services.utils import retry_wrapper
-from src.socket_instance import emit_agent
+from src.filesystem.code_writer import PatchError, resolve_edits, write_files
+from src.services.code_parser import CodeFileStream, emulate_code_writing, parse_code_response
 
 PROMPT = open("src/agents/feature/prompt.jinja2", "r").read().strip()
 
@@ -35,45 +34,16 @@ class Feature:
         )
 
     def validate_response(self, response: str) -> Union[List[Dict[str, str]], bool]:
-        response = response.strip()
-
-        response = response.split("~~~", 1)[1]
-        response = response[:response.rfind("~~~")]
-        response = response.strip()
-
-        result = []
-        current_file = None
-        current_code = []
-        code_block = False
-
-        for line in response.split("\n"):
-            if line.startswith("File: "):
-                if current_file and current_code:
-                    result.append({"file": current_file, "code": "\n".join(current_code)})
-                current_file = line.split("`")[1].strip()
-                current_code = []
-                code_block = False
-            elif line.startswith("```"):
-                code_block = not code_block
-            else:
-                current_code.append(line)
-
-        if current_file and current_code:
-            result.append({"file": current_file, "code": "\n".join(current_code)})
-
-        return result
+        return parse_code_response(response.strip())
 
     def save_code_to_project(self, response: List[Dict[str, str]], project_name: str):
         file_path_dir = None
         project_name = project_name.lower().replace(" ", "-")
 
-        for file in response:
-            file_path = os.path.join(self.project_dir, project_name, file['file'])
-            file_path_dir = os.path.dirname(file_path)
-            os.makedirs(file_path_dir, exist_ok=True)
-    
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(file["code"])
+        project_path = os.path.join(self.project_dir, project_name)
+        write_files(project_path, response)
+        if response:
+            file_path_dir = os.path.dirname(os.path.join(project_path, response[-1]['file']))
         
         return file_path_dir
 
@@ -85,28 +55,6 @@ class Feature:
         response = "\n".join([f"File: `{file['file']}`:\n```\n{file['code']}\n```" for file in response])
         return f"~~~\n{response}\n~~~"
 
-    def emulate_code_writing(self, code_set: list, project_name: str):
-        files = []
-        for file in code_set:
-            filename = file["file"]
-            code = file["code"]
-
-            new_state = AgentState().new_state()
-            new_state["internal_monologue"] = "Writing code..."
-            new_state["terminal_session"]["title"] = f"Editing {filename}"
-            new_state["terminal_session"]["command"] = f"vim {filename}"
-            new_state["terminal_session"]["output"] = code
-            files.append({
-                "file": filename,
-                "code": code,
-            })
-            AgentState().add_to_current_state(project_name, new_state)
-            time.sleep(1)
-        emit_agent("code", {
-            "files": files,
-            "from": "feature"
-        })
-
     @retry_wrapper
     def execute(
         self,
@@ -116,13 +64,20 @@ class Feature:
         project_name: str
     ) -> str:
         prompt = self.render(conversation, code_markdown, system_os)
-        response = self.llm.inference(prompt, project_name)
+        code_stream = CodeFileStream(project_name, "feature")
+        response = self.llm.inference(prompt, project_name, on_token=code_stream)
         
         valid_response = self.validate_response(response)
         
         if not valid_response:
             return False
+
+        try:
+            valid_response = resolve_edits(self.get_project_path(project_name), valid_response)
+        except PatchError as e:
+            print(f"Edit does not apply: {e}")
+            return False
         
-        self.emulate_code_writing(valid_response, project_name)
+        emulate_code_writing(valid_response, project_name, "feature", code_stream.emitted)
 
         return valid_response
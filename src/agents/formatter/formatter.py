@@ -1,6 +1,6 @@
 from jinja2 import Environment, BaseLoader
 
-from src.llm import LLM
+from src.llm import LLM, PRIORITY_LOW
 
 PROMPT = open("src/agents/formatter/prompt.jinja2").read().strip()
 
@@ -18,5 +18,5 @@ class Formatter:
 
     def execute(self, raw_text: str, project_name: str) -> str:
         raw_text = self.render(raw_text)
-        response = self.llm.inference(raw_text, project_name)
+        response = self.llm.inference(raw_text, project_name, priority=PRIORITY_LOW)
         return response
\ No newline at end of file
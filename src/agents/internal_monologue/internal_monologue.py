@@ -7,6 +7,15 @@ from src.services.utils import retry_wrapper, validate_responses
 
 PROMPT = open("src/agents/internal_monologue/prompt.jinja2").read().strip()
 
+RESPONSE_SCHEMA = {
+    "title": "internal_monologue",
+    "type": "object",
+    "properties": {
+        "internal_monologue": {"type": "string"}
+    },
+    "required": ["internal_monologue"]
+}
+
 class InternalMonologue:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
@@ -28,7 +37,7 @@ class InternalMonologue:
     @retry_wrapper
     def execute(self, current_prompt: str, project_name: str) -> str:
         rendered_prompt = self.render(current_prompt)
-        response = self.llm.inference(rendered_prompt, project_name)
+        response = self.llm.inference(rendered_prompt, project_name, schema=RESPONSE_SCHEMA)
         valid_response = self.validate_response(response)
         return valid_response
 
@@ -3,7 +3,7 @@ import json
 from jinja2 import Environment, BaseLoader
 
 from src.services.utils import retry_wrapper
-from src.llm import LLM
+from src.llm import LLM, PRIORITY_LOW
 
 PROMPT = open("src/agents/reporter/prompt.jinja2").read().strip()
 
@@ -34,7 +34,7 @@ class Reporter:
         project_name: str
     ) -> str:
         prompt = self.render(conversation, code_markdown)
-        response = self.llm.inference(prompt, project_name)
+        response = self.llm.inference(prompt, project_name, priority=PRIORITY_LOW)
         
         valid_response = self.validate_response(response)
         
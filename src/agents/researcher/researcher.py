@@ -9,6 +9,16 @@ from src.browser.search import BingSearch
 
 PROMPT = open("src/agents/researcher/prompt.jinja2").read().strip()
 
+RESPONSE_SCHEMA = {
+    "title": "research",
+    "type": "object",
+    "properties": {
+        "queries": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+        "ask_user": {"type": "string"}
+    },
+    "required": ["queries", "ask_user"]
+}
+
 
 class Researcher:
     def __init__(self, base_model: str):
@@ -39,7 +49,7 @@ class Researcher:
         contextual_keywords_str = ", ".join(map(lambda k: k.capitalize(), contextual_keywords))
         prompt = self.render(step_by_step_plan, contextual_keywords_str)
         
-        response = self.llm.inference(prompt, project_name)
+        response = self.llm.inference(prompt, project_name, schema=RESPONSE_SCHEMA)
         
         valid_response = self.validate_response(response)
 
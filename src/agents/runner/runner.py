@@ -15,6 +15,26 @@ from src.services.utils import retry_wrapper, validate_responses
 PROMPT = open("src/agents/runner/prompt.jinja2", "r").read().strip()
 RERUNNER_PROMPT = open("src/agents/runner/rerunner.jinja2", "r").read().strip()
 
+RESPONSE_SCHEMA = {
+    "title": "run_commands",
+    "type": "object",
+    "properties": {
+        "commands": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["commands"]
+}
+
+RERUNNER_RESPONSE_SCHEMA = {
+    "title": "rerun",
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["patch", "command"]},
+        "command": {"type": "string"},
+        "response": {"type": "string"}
+    },
+    "required": ["action", "response"]
+}
+
 class Runner:
     def __init__(self, base_model: str):
         self.base_model = base_model
@@ -116,7 +136,7 @@ class Runner:
                     error=command_output
                 )
                 
-                response = self.llm.inference(prompt, project_name)
+                response = self.llm.inference(prompt, project_name, schema=RERUNNER_RESPONSE_SCHEMA)
                 
                 valid_response = self.validate_rerunner_response(response)
                 
@@ -206,7 +226,7 @@ class Runner:
         project_name: str
     ) -> str:
         prompt = self.render(conversation, code_markdown, os_system)
-        response = self.llm.inference(prompt, project_name)
+        response = self.llm.inference(prompt, project_name, schema=RESPONSE_SCHEMA)
         
         valid_response = self.validate_response(response)
         
@@ -1,9 +1,27 @@
+from threading import Lock
+from typing import List
+
 from keybert import KeyBERT
 
+# KeyBERT loads the sentence-transformer weights on construction, so the whole
+# process shares one instance; `src/memory/rag.py` reuses its model as well.
+_kw_model = None
+_kw_model_lock = Lock()
+
+
+def get_kw_model() -> KeyBERT:
+    global _kw_model
+    if _kw_model is None:
+        with _kw_model_lock:
+            if _kw_model is None:
+                _kw_model = KeyBERT()
+    return _kw_model
+
+
 class SentenceBert:
     def __init__(self, sentence: str):
         self.sentence = sentence
-        self.kw_model = KeyBERT()
+        self.kw_model = get_kw_model()
 
     def extract_keywords(self, top_n: int = 5) -> list:
         keywords = self.kw_model.extract_keywords(
@@ -15,3 +33,23 @@ class SentenceBert:
             diversity=0.7
         )
         return keywords
+
+    @staticmethod
+    def extract_keywords_batch(sentences: List[str], top_n: int = 5) -> List[list]:
+        """
+        Keywords of many sentences at once, embedded in a single batch.
+        """
+        if not sentences:
+            return []
+        keywords = get_kw_model().extract_keywords(
+            sentences,
+            keyphrase_ngram_range=(1, 1),
+            stop_words='english',
+            top_n=top_n,
+            use_mmr=True,
+            diversity=0.7
+        )
+        # KeyBERT unwraps the result when it is given a single document
+        if len(sentences) == 1:
+            return [keywords]
+        return keywords
@@ -1,2 +1,3 @@
 from .browser import Browser
+from .pool import BrowserPool, get_browser_pool
 from .interaction import start_interaction
\ No newline at end of file
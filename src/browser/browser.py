@@ -1,6 +1,7 @@
 import asyncio
 import base64
 import os
+from urllib.parse import urlparse
 
 from playwright.sync_api import sync_playwright, TimeoutError, Page
 from playwright.async_api import async_playwright, TimeoutError
@@ -11,11 +12,27 @@ from src.config import Config
 from src.state import AgentState
 
 
+# resources that never contribute to the page text, blocked in fast mode
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+
+
+def _site(hostname: str) -> str:
+    """
+    Registrable part of a host name, good enough to tell first-party scripts
+    (`cdn.example.com` on `www.example.com`) from third-party ones.
+    """
+    return ".".join((hostname or "").split(".")[-2:])
+
+
 class Browser:
-    def __init__(self):
+    def __init__(self, page=None):
+        """
+        `page` is a page leased from the `BrowserPool`; without one, `start`
+        launches a standalone Chromium that `close` shuts down again.
+        """
         self.playwright = None
         self.browser = None
-        self.page = None
+        self.page = page
         self.agent = AgentState()
 
     async def start(self):
@@ -27,16 +44,51 @@ class Browser:
     # def new_page(self):
     #     return self.browser.new_page()
 
-    async def go_to(self, url):
+    async def block_resources(self, url):
+        """
+        Abort images, fonts, media and third-party scripts.
+        """
+        site = _site(urlparse(url).hostname)
+
+        async def handle(route):
+            request = route.request
+            if request.resource_type in BLOCKED_RESOURCE_TYPES:
+                await route.abort()
+            elif request.resource_type == "script" and _site(urlparse(request.url).hostname) != site:
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await self.page.route("**/*", handle)
+
+    async def go_to(self, url, fast=False):
+        """
+        With `fast`, only wait for the DOM plus a short network-idle budget, with
+        the resources that don't contribute to the text blocked.
+        """
         try:
-            await self.page.goto(url, timeout=20000)
+            if not fast:
+                await self.page.goto(url, timeout=20000)
+                return True
+
+            config = Config()
+            await self.block_resources(url)
+            await self.page.goto(url, timeout=20000, wait_until="domcontentloaded")
+            try:
+                await self.page.wait_for_load_state("networkidle", timeout=config.get_browser_network_idle_budget())
+            except TimeoutError:
+                pass
 
         except TimeoutError as e:
             print(f"TimeoutError: {e} when trying to navigate to {url}")
             return False
         return True
 
-    async def screenshot(self, project_name):
+    async def screenshot(self, project_name, fast=False):
+        """
+        Full-page PNG on disk plus a viewport PNG for the UI, or with `fast` a single
+        downscaled viewport JPEG used for both.
+        """
         screenshots_save_path = Config().get_screenshots_dir()
 
         page_metadata = await self.page.evaluate("() => { return { url: document.location.href, title: document.title } }")
@@ -46,8 +98,12 @@ class Browser:
         path_to_save = os.path.join(screenshots_save_path, filename_to_save)
 
         await self.page.emulate_media(media="screen")
-        await self.page.screenshot(path=path_to_save, full_page=True)
-        screenshot = await self.page.screenshot()
+        if fast:
+            path_to_save = path_to_save[:-len(".png")] + ".jpg"
+            screenshot = await self.page.screenshot(path=path_to_save, type="jpeg", quality=50, scale="css")
+        else:
+            await self.page.screenshot(path=path_to_save, full_page=True)
+            screenshot = await self.page.screenshot()
         screenshot_bytes = base64.b64encode(screenshot).decode()
         new_state = self.agent.new_state()
         new_state["internal_monologue"] = "Browsing the web right now..."
@@ -86,4 +142,6 @@ class Browser:
 
     async def close(self):
         await self.page.close()
-        await self.browser.close()
+        if self.browser:
+            await self.browser.close()
+            await self.playwright.stop()
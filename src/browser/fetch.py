@@ -0,0 +1,118 @@
+"""
+Plain HTTP fetch for static pages, so research can skip the browser entirely
+when a page does not need JavaScript to render its text.
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+import requests
+from requests.compat import chardet
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0 Safari/537.36"
+)
+# pages with less text than this are most likely rendered client-side
+MIN_STATIC_TEXT_LENGTH = 500
+MAX_HTML_BYTES = 5 * 1024 * 1024
+JS_REQUIRED_MARKERS = ("enable javascript", "javascript is required", "javascript is disabled")
+# browsers only look for the <meta> charset in the first 1024 bytes
+META_CHARSET_BYTES = 1024
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "footer", "nav", "aside",
+    "br", "li", "ul", "ol", "table", "tr", "pre", "blockquote",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Visible text of an HTML document, roughly what `document.body.innerText` gives.
+    """
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = (" ".join(line.split()) for line in "".join(extractor.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _known_encoding(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def detect_encoding(content_type: str, html: bytes) -> str:
+    """
+    Encoding of an HTML body: the charset the server declared, then the one in
+    the page's <meta> tag, then a guess from the bytes. Unlike `response.encoding`
+    this does not fall back to ISO-8859-1 when the header has no charset.
+    """
+    for parameter in content_type.split(";")[1:]:
+        key, _, value = parameter.partition("=")
+        if key.strip().lower() == "charset":
+            encoding = _known_encoding(value.strip().strip("\"'"))
+            if encoding:
+                return encoding
+
+    match = META_CHARSET_RE.search(html[:META_CHARSET_BYTES])
+    if match:
+        encoding = _known_encoding(match.group(1).decode("ascii"))
+        if encoding:
+            return encoding
+
+    return _known_encoding(chardet.detect(html).get("encoding")) or "utf-8"
+
+
+def fetch_static_text(url: str, timeout: float = 10) -> Optional[str]:
+    """
+    Text of `url` if it can be read without a browser, None otherwise.
+    """
+    try:
+        with requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if "html" not in content_type:
+                return None
+            html = response.raw.read(MAX_HTML_BYTES, decode_content=True)
+        html = html.decode(detect_encoding(content_type, html), errors="replace")
+    except (requests.RequestException, ValueError) as e:
+        print(f"Static fetch failed for {url}: {e}")
+        return None
+
+    text = html_to_text(html)
+    lowered = text[:2000].lower()
+    if len(text) < MIN_STATIC_TEXT_LENGTH or any(marker in lowered for marker in JS_REQUIRED_MARKERS):
+        return None
+    return text
@@ -5,7 +5,6 @@
 #
 # MODIFIED FOR DEVIKA
 
-from playwright.sync_api import sync_playwright
 import os
 import time
 from sys import exit, platform
@@ -13,6 +12,7 @@ from sys import exit, platform
 from src.config import Config
 from src.state import AgentState
 from src.llm import LLM
+from src.browser.pool import get_browser_pool
 
 prompt_template = """
 You are an agent controlling a browser. You are given:
@@ -156,28 +156,29 @@ black_listed_elements = set(["html", "head", "title", "meta", "iframe", "body",
 
 class Crawler:
 	def __init__(self):
-		self.browser = (
-			sync_playwright()
-			.start()
-			.chromium.launch(
-				headless=True,
-			)
-		)
-
-		self.page = self.browser.new_page()
-		self.page.set_viewport_size({"width": 1280, "height": 1080})
+		# the page is leased from the shared browser pool and driven from this
+		# thread by running each call on the pool's event loop
+		self.pool = get_browser_pool()
+		self.run = self.pool.run
+		self.page = self.run(self.pool.acquire())
+		self.run(self.page.set_viewport_size({"width": 1280, "height": 1080}))
+
+	def close(self):
+		if self.page:
+			self.run(self.pool.release(self.page))
+			self.page = None
   
 	def screenshot(self, project_name):
 		screenshots_save_path = Config().get_screenshots_dir()
 
-		page_metadata = self.page.evaluate("() => { return { url: document.location.href, title: document.title } }")
+		page_metadata = self.run(self.page.evaluate("() => { return { url: document.location.href, title: document.title } }"))
 		page_url = page_metadata['url']
 		random_filename = os.urandom(20).hex()
 		filename_to_save = f"{random_filename}.png"
 		path_to_save = os.path.join(screenshots_save_path, filename_to_save)
 
-		self.page.emulate_media(media="screen")
-		self.page.screenshot(path=path_to_save)
+		self.run(self.page.emulate_media(media="screen"))
+		self.run(self.page.screenshot(path=path_to_save))
 
 		new_state = AgentState().new_state()
 		new_state["internal_monologue"] = "Browsing the web right now..."
@@ -188,19 +189,19 @@ class Crawler:
 		return path_to_save
 
 	def go_to_page(self, url):
-		self.page.goto(url=url if "://" in url else "http://" + url)
-		self.client = self.page.context.new_cdp_session(self.page)
+		self.run(self.page.goto(url=url if "://" in url else "http://" + url))
+		self.client = self.run(self.page.context.new_cdp_session(self.page))
 		self.page_element_buffer = {}
 
 	def scroll(self, direction):
 		if direction == "up":
-			self.page.evaluate(
+			self.run(self.page.evaluate(
 				"(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop - window.innerHeight;"
-			)
+			))
 		elif direction == "down":
-			self.page.evaluate(
+			self.run(self.page.evaluate(
 				"(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop + window.innerHeight;"
-			)
+			))
 
 	def click(self, id):
 		# Inject javascript into the page which removes the target= attribute from all links
@@ -210,23 +211,23 @@ class Crawler:
 			links[i].removeAttribute("target");
 		}
 		"""
-		self.page.evaluate(js)
+		self.run(self.page.evaluate(js))
 
 		element = self.page_element_buffer.get(int(id))
 		if element:
 			x = element.get("center_x")
 			y = element.get("center_y")
 			
-			self.page.mouse.click(x, y)
+			self.run(self.page.mouse.click(x, y))
 		else:
 			print("Could not find element")
 
 	def type(self, id, text):
 		self.click(id)
-		self.page.keyboard.type(text)
+		self.run(self.page.keyboard.type(text))
 
 	def enter(self):
-		self.page.keyboard.press("Enter")
+		self.run(self.page.keyboard.press("Enter"))
 
 	def crawl(self):
 		page = self.page
@@ -235,27 +236,40 @@ class Crawler:
 
 		page_state_as_text = []
 
-		device_pixel_ratio = page.evaluate("window.devicePixelRatio")
+		# one round trip to the page for all the window metrics
+		metrics = self.run(page.evaluate("""() => ({
+			devicePixelRatio: window.devicePixelRatio,
+			scrollX: window.scrollX,
+			scrollY: window.scrollY,
+			pageYOffset: window.pageYOffset,
+			pageXOffset: window.pageXOffset,
+			screenWidth: window.screen.width,
+			screenHeight: window.screen.height,
+			offsetHeight: document.body.offsetHeight,
+			scrollHeight: document.body.scrollHeight,
+		})"""))
+
+		device_pixel_ratio = metrics["devicePixelRatio"]
 		if platform == "darwin" and device_pixel_ratio == 1:  # lies
 			device_pixel_ratio = 2
 
-		win_scroll_x 		= page.evaluate("window.scrollX")
-		win_scroll_y 		= page.evaluate("window.scrollY")
-		win_upper_bound 	= page.evaluate("window.pageYOffset")
-		win_left_bound 		= page.evaluate("window.pageXOffset") 
-		win_width 			= page.evaluate("window.screen.width")
-		win_height 			= page.evaluate("window.screen.height")
+		win_scroll_x 		= metrics["scrollX"]
+		win_scroll_y 		= metrics["scrollY"]
+		win_upper_bound 	= metrics["pageYOffset"]
+		win_left_bound 		= metrics["pageXOffset"]
+		win_width 			= metrics["screenWidth"]
+		win_height 			= metrics["screenHeight"]
 		win_right_bound 	= win_left_bound + win_width
 		win_lower_bound 	= win_upper_bound + win_height
-		document_offset_height = page.evaluate("document.body.offsetHeight")
-		document_scroll_height = page.evaluate("document.body.scrollHeight")
+		document_offset_height = metrics["offsetHeight"]
+		document_scroll_height = metrics["scrollHeight"]
 
 		# Removed unused percentage_progress variables
 
-		tree = self.client.send(
+		tree = self.run(self.client.send(
 			"DOMSnapshot.captureSnapshot",
 			{"computedStyles": [], "includeDOMRects": True, "includePaintOrder": True},
-		)
+		))
 		strings	 	= tree["strings"]
 		document 	= tree["documents"][0]
 		nodes 		= document["nodes"]
@@ -545,3 +559,5 @@ def start_interaction(model_id, objective, project_name):
 	except KeyboardInterrupt:
 		print("\n[!] Ctrl+C detected, exiting gracefully.")
 		exit(0)
+	finally:
+		_crawler.close()
@@ -0,0 +1,127 @@
+"""
+Long-lived Chromium shared by every agent of the process.
+
+Playwright objects are bound to the event loop that created them, so the pool
+owns a dedicated event loop running in a background thread. Async callers run
+their coroutines on it through `BrowserPool.run`; each lease hands out a page in
+its own isolated browser context, which is closed when the page is returned.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from threading import Lock, Thread
+
+from playwright.async_api import async_playwright, Error
+
+from src.config import Config
+from src.logger import Logger
+
+logger = Logger()
+
+# relaunch Chromium after this many leases to bound its memory growth
+RECYCLE_AFTER_LEASES = 200
+
+
+class BrowserPool:
+    def __init__(self, max_pages: int):
+        self.max_pages = max_pages
+        self.playwright = None
+        self.browser = None
+        self.active_leases = 0
+        self.leases_served = 0
+        self.semaphore = asyncio.Semaphore(max_pages)
+        self.browser_lock = asyncio.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="browser-pool", daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        """
+        Run a coroutine on the pool's event loop and wait for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _launch(self):
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        self.leases_served = 0
+        logger.info("Browser pool: launched Chromium")
+
+    async def _close_browser(self):
+        browser, self.browser = self.browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Error as e:
+                logger.warning(f"Browser pool: error closing Chromium: {e}")
+
+    async def _ensure_browser(self):
+        async with self.browser_lock:
+            if self.browser is not None and not self.browser.is_connected():
+                logger.warning("Browser pool: Chromium is not responding, restarting it")
+                await self._close_browser()
+            elif self.browser is not None and self.leases_served >= RECYCLE_AFTER_LEASES and self.active_leases == 0:
+                await self._close_browser()
+            if self.browser is None:
+                await self._launch()
+            return self.browser
+
+    async def acquire(self):
+        """
+        Lease a fresh page in its own browser context. Waits while `max_pages`
+        pages are leased. Every acquired page must be given back with `release`.
+        """
+        await self.semaphore.acquire()
+        try:
+            browser = await self._ensure_browser()
+            try:
+                context = await browser.new_context()
+            except Error:
+                # the browser died between the health check and now
+                async with self.browser_lock:
+                    await self._close_browser()
+                browser = await self._ensure_browser()
+                context = await browser.new_context()
+            page = await context.new_page()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        self.active_leases += 1
+        self.leases_served += 1
+        return page
+
+    async def release(self, page):
+        try:
+            await page.context.close()
+        except Error as e:
+            logger.warning(f"Browser pool: error closing context: {e}")
+        finally:
+            self.active_leases -= 1
+            self.semaphore.release()
+
+    @asynccontextmanager
+    async def lease(self):
+        page = await self.acquire()
+        try:
+            yield page
+        finally:
+            await self.release(page)
+
+    async def close(self):
+        await self._close_browser()
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool(max_pages=Config().get_browser_max_pages())
+    return _pool
@@ -99,6 +99,9 @@ class Config:
     def get_repos_dir(self):
         return self.config["STORAGE"]["REPOS_DIR"]
 
+    def get_rag_dir(self):
+        return self.config["STORAGE"]["RAG_DIR"]
+
     def get_logging_rest_api(self):
         return self.config["LOGGING"]["LOG_REST_API"] == "true"
 
@@ -108,6 +111,91 @@ class Config:
     def get_timeout_inference(self):
         return self.config["TIMEOUT"]["INFERENCE"]
 
+    def get_timeout_user_reply(self):
+        return self.config["TIMEOUT"]["USER_REPLY"]
+
+    def get_llm_stream(self):
+        return self.config["LLM"]["STREAM"] == "true"
+
+    def get_llm_cache(self):
+        return self.config["LLM"]["CACHE"] == "true"
+
+    def get_llm_json_mode(self):
+        return self.config["LLM"]["JSON_MODE"] == "true"
+
+    def get_llm_max_retries(self):
+        return self.config["LLM"]["MAX_RETRIES"]
+
+    def get_llm_fallback_models(self):
+        return self.config["LLM"]["FALLBACK_MODELS"]
+
+    def get_llm_hedge(self):
+        return self.config["LLM"]["HEDGE"] == "true"
+
+    def get_llm_usage_flush_interval(self):
+        return self.config["LLM"]["USAGE_FLUSH_INTERVAL"]
+
+    def get_llm_cache_ttl(self):
+        return self.config["LLM"]["CACHE_TTL"]
+
+    def get_llm_cache_max_entries(self):
+        return self.config["LLM"]["CACHE_MAX_ENTRIES"]
+
+    def get_research_max_concurrency(self):
+        return self.config["RESEARCH"]["MAX_CONCURRENCY"]
+
+    def get_browser_max_pages(self):
+        return self.config["BROWSER"]["MAX_PAGES"]
+
+    def get_browser_fast_fetch(self):
+        return self.config["BROWSER"]["FAST_FETCH"] == "true"
+
+    def get_browser_network_idle_budget(self):
+        return self.config["BROWSER"]["NETWORK_IDLE_BUDGET"]
+
+    def get_browser_screenshots(self):
+        return self.config["BROWSER"]["SCREENSHOTS"] == "true"
+
+    def get_browser_http_fallback(self):
+        return self.config["BROWSER"]["HTTP_FALLBACK"] == "true"
+
+    def get_research_cache(self):
+        return self.config["RESEARCH"]["CACHE"] == "true"
+
+    def get_research_cache_ttl(self):
+        return self.config["RESEARCH"]["CACHE_TTL"]
+
+    def get_research_cache_min_relevance(self):
+        return self.config["RESEARCH"]["CACHE_MIN_RELEVANCE"]
+
+    def get_rag_enabled(self):
+        return self.config["RAG"]["ENABLED"] == "true"
+
+    def get_rag_top_k(self):
+        return self.config["RAG"]["TOP_K"]
+
+    def get_context_token_budget(self):
+        return self.config["CONTEXT"]["TOKEN_BUDGET"]
+
+    def get_context_max_file_size(self):
+        return self.config["CONTEXT"]["MAX_FILE_SIZE"]
+
+    def get_rate_limit_enabled(self):
+        return self.config["RATE_LIMIT"]["ENABLED"] == "true"
+
+    def get_rate_limit(self, provider):
+        """
+        (requests per minute, tokens per minute) for a provider, 0 meaning unlimited.
+        """
+        limits = self.config["RATE_LIMIT"]
+        return limits.get(f"{provider}_RPM", 0), limits.get(f"{provider}_TPM", 0)
+
+    def get_state_write_behind(self):
+        return self.config["STATE"]["WRITE_BEHIND"] == "true"
+
+    def get_state_flush_interval(self):
+        return self.config["STATE"]["FLUSH_INTERVAL"]
+
     def set_bing_api_key(self, key):
         self.config["API_KEYS"]["BING"] = key
         self.save_config()
@@ -172,6 +260,22 @@ class Config:
         self.config["TIMEOUT"]["INFERENCE"] = value
         self.save_config()
 
+    def set_timeout_user_reply(self, value):
+        self.config["TIMEOUT"]["USER_REPLY"] = value
+        self.save_config()
+
+    def set_llm_stream(self, value):
+        self.config["LLM"]["STREAM"] = "true" if value else "false"
+        self.save_config()
+
+    def set_llm_cache(self, value):
+        self.config["LLM"]["CACHE"] = "true" if value else "false"
+        self.save_config()
+
+    def set_state_write_behind(self, value):
+        self.config["STATE"]["WRITE_BEHIND"] = "true" if value else "false"
+        self.save_config()
+
     def save_config(self):
         with open("config.toml", "w") as f:
             toml.dump(self.config, f)
@@ -0,0 +1,84 @@
+"""
+Process-wide SQLite engine shared by every storage class (`AgentState`,
+`ProjectManager`, `KnowledgeBase`, ...). The database runs in WAL mode so the
+UI polling endpoints can read while an agent is writing.
+"""
+from threading import Lock
+
+from sqlalchemy import event, inspect
+from sqlmodel import SQLModel, create_engine
+
+from src.config import Config
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,  # in KiB
+    "temp_store": "MEMORY",
+}
+
+_engine = None
+_engine_lock = Lock()
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                sqlite_path = Config().get_sqlite_db()
+                engine = create_engine(
+                    f"sqlite:///{sqlite_path}",
+                    connect_args={"check_same_thread": False},
+                    pool_size=10,
+                    max_overflow=20,
+                    pool_pre_ping=True,
+                )
+                event.listen(engine, "connect", _set_sqlite_pragmas)
+                _engine = engine
+    return _engine
+
+
+def add_missing_columns(engine):
+    """
+    `create_all` only creates missing tables; add the columns and indexes that
+    were added to existing models since the database was created. New columns
+    must be nullable.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
+def init_database():
+    """
+    Create the schema and migrate legacy data. Runs once at startup.
+    """
+    # import the storage classes so their tables are registered on the metadata
+    from src.state import AgentState
+    from src.project import ProjectManager
+    from src.memory import KnowledgeBase
+    from src.llm.cache import LLMResponseCache
+
+    SQLModel.metadata.create_all(get_engine())
+    add_missing_columns(get_engine())
+
+    AgentState().migrate_legacy_states()
+    ProjectManager().migrate_legacy_messages()
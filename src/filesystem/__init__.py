@@ -1 +1,2 @@
-from .read_code import ReadCode
\ No newline at end of file
+from .read_code import ReadCode
+from .context import ContextBuilder
\ No newline at end of file
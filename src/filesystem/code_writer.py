@@ -0,0 +1,185 @@
+"""
+Agents may answer with whole files, search/replace blocks or unified diffs:
+
+    <<<<<<< SEARCH
+    old lines
+    =======
+    new lines
+    >>>>>>> REPLACE
+
+Edits are resolved against the files on disk into full contents before
+anything is written, so a hunk that does not apply fails validation and the
+agent retries instead of leaving a half-patched project.
+"""
+import os
+import re
+import tempfile
+from typing import List, Dict, Optional
+
+SEARCH_MARKER = re.compile(r"^<{5,}\s*SEARCH\s*$")
+DIVIDER_MARKER = re.compile(r"^={5,}\s*$")
+REPLACE_MARKER = re.compile(r"^>{5,}\s*REPLACE\s*$")
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+class PatchError(ValueError):
+    pass
+
+
+def is_search_replace(code: str) -> bool:
+    return any(SEARCH_MARKER.match(line) for line in code.split("\n"))
+
+
+def is_unified_diff(code: str) -> bool:
+    return any(HUNK_HEADER.match(line) for line in code.split("\n"))
+
+
+def _find_lines(lines: List[str], needle: List[str], hint: int = 0) -> int:
+    """
+    Start of `needle` in `lines`, the occurrence closest to `hint` winning.
+    Falls back to comparing with trailing whitespace stripped.
+    """
+    if not needle:
+        return min(max(hint, 0), len(lines))
+
+    for normalize in (lambda s: s, lambda s: s.rstrip()):
+        target = [normalize(line) for line in needle]
+        haystack = [normalize(line) for line in lines]
+        matches = [
+            i for i in range(len(haystack) - len(target) + 1)
+            if haystack[i:i + len(target)] == target
+        ]
+        if matches:
+            return min(matches, key=lambda i: abs(i - hint))
+    return -1
+
+
+def apply_search_replace(original: str, edits: str) -> str:
+    blocks = []
+    search, replace, mode = [], [], None
+    for line in edits.split("\n"):
+        if SEARCH_MARKER.match(line):
+            search, replace, mode = [], [], "search"
+        elif DIVIDER_MARKER.match(line) and mode == "search":
+            mode = "replace"
+        elif REPLACE_MARKER.match(line) and mode == "replace":
+            blocks.append((search, replace))
+            mode = None
+        elif mode == "search":
+            search.append(line)
+        elif mode == "replace":
+            replace.append(line)
+    if mode is not None:
+        raise PatchError("Unterminated SEARCH/REPLACE block")
+
+    lines = original.split("\n") if original else []
+    for search, replace in blocks:
+        if not any(line.strip() for line in search):
+            # An empty SEARCH creates the file or appends to it
+            lines = lines + replace if lines else list(replace)
+            continue
+        start = _find_lines(lines, search)
+        if start < 0:
+            raise PatchError("SEARCH block not found:\n" + "\n".join(search))
+        lines[start:start + len(search)] = replace
+    return "\n".join(lines)
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    hunks = []
+    # Blank lines around the diff are fence padding, not blank context lines
+    for line in diff.strip("\n").split("\n"):
+        header = HUNK_HEADER.match(line)
+        if header:
+            hunks.append((int(header.group(1)) - 1, [], []))
+        elif not hunks or line.startswith("--- ") or line.startswith("+++ ") or line.startswith("\\"):
+            continue
+        elif line.startswith("-"):
+            hunks[-1][1].append(line[1:])
+        elif line.startswith("+"):
+            hunks[-1][2].append(line[1:])
+        else:
+            # Context line; models often drop the leading space of blank lines
+            context = line[1:] if line.startswith(" ") else line
+            hunks[-1][1].append(context)
+            hunks[-1][2].append(context)
+
+    lines = original.split("\n") if original else []
+    offset = 0
+    for hint, old, new in hunks:
+        start = _find_lines(lines, old, hint + offset)
+        if start < 0:
+            raise PatchError("Diff hunk does not apply:\n" + "\n".join(old))
+        lines[start:start + len(old)] = new
+        offset += len(new) - len(old)
+    return "\n".join(lines)
+
+
+def read_existing(file_path: str) -> Optional[str]:
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+
+def resolve_file_code(existing: Optional[str], code: str) -> str:
+    """
+    Full new contents of a file, given its current contents and what the model
+    returned for it.
+    """
+    if is_search_replace(code):
+        return apply_search_replace(existing or "", code)
+    if is_unified_diff(code):
+        return apply_unified_diff(existing or "", code)
+    return code
+
+
+def resolve_edits(project_path: str, files: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Turn the parsed response into `{"file", "code"}` entries with full contents.
+    Raises `PatchError` when an edit does not apply.
+    """
+    resolved = {}
+    for file in files:
+        file_path = os.path.join(project_path, file["file"])
+        existing = resolved.get(file["file"])
+        if existing is None:
+            existing = read_existing(file_path)
+        resolved[file["file"]] = resolve_file_code(existing, file["code"])
+    return [{"file": name, "code": code} for name, code in resolved.items()]
+
+
+def atomic_write(file_path: str, content: str):
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        if os.path.exists(file_path):
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        else:
+            # mkstemp creates files as 0600; new files get the mode open() would give them.
+            # The umask can only be read by setting it, so put it back straight away.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_files(project_path: str, files: List[Dict[str, str]]) -> List[str]:
+    """
+    Write resolved `{"file", "code"}` entries, skipping files whose contents did
+    not change. Returns the paths that were written.
+    """
+    written = []
+    for file in files:
+        file_path = os.path.join(project_path, file["file"])
+        if read_existing(file_path) == file["code"]:
+            continue
+        atomic_write(file_path, file["code"])
+        written.append(file_path)
+    return written
@@ -0,0 +1,210 @@
+import os
+import math
+import fnmatch
+from collections import Counter
+from typing import List, Optional
+
+import tiktoken
+
+from src.config import Config
+from src.filesystem.file_index import get_file_index
+from src.memory.knowledge_base import tokenize
+
+IGNORED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", "env",
+    ".mypy_cache", ".pytest_cache", ".tox", ".next", ".nuxt", ".svelte-kit",
+    "dist", "build", "target", "coverage", ".idea", ".vscode",
+}
+LOCKFILES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "bun.lockb", "uv.lock",
+}
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".svgz", ".pdf",
+    ".zip", ".gz", ".tar", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".jar", ".war",
+    ".exe", ".dll", ".so", ".dylib", ".o", ".a", ".class", ".pyc", ".pyo", ".wasm",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".wav", ".ogg",
+    ".mov", ".avi", ".sqlite", ".db", ".bin", ".npy", ".pkl",
+}
+SNIFF_BYTES = 8192
+# How many of the latest conversation messages drive the ranking
+RECENT_MESSAGES = 6
+VECTOR_WEIGHT = 2.0
+
+
+class GitIgnore:
+    """
+    The subset of `.gitignore` semantics that matters for picking context:
+    globs, `/` anchoring, directory-only patterns and `!` negation.
+    """
+    def __init__(self, directory: str):
+        self.rules = []
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            lines = []
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+            anchored = "/" in line.lstrip("/") or line.startswith("/")
+            self.rules.append((line.lstrip("/"), negate, dir_only, anchored))
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        rel_path = rel_path.replace(os.sep, "/")
+        name = rel_path.rsplit("/", 1)[-1]
+        ignored = False
+        for pattern, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            target = rel_path if anchored else name
+            if fnmatch.fnmatch(target, pattern):
+                ignored = not negate
+        return ignored
+
+
+def get_encoding(model_id: str = None):
+    try:
+        return tiktoken.encoding_for_model(model_id)
+    except (KeyError, TypeError):
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def is_binary(path: str) -> bool:
+    if os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS:
+        return True
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(SNIFF_BYTES)
+    except OSError:
+        return True
+
+
+class ContextBuilder:
+    """
+    Builds the code context handed to the agents: the project's text files,
+    most relevant to the conversation first, until the token budget is spent.
+    """
+    def __init__(self, project_name: str, model_id: str = None):
+        config = Config()
+        project_path = config.get_projects_dir()
+        self.directory_path = os.path.join(project_path, project_name.lower().replace(" ", "-"))
+        self.token_budget = config.get_context_token_budget()
+        self.max_file_size = config.get_context_max_file_size()
+        self.encoding = get_encoding(model_id)
+        self._candidates: Optional[List[str]] = None
+
+    def candidate_files(self) -> List[str]:
+        """
+        The project files worth showing an agent, walked once per builder.
+        """
+        if self._candidates is None:
+            self._candidates = self._walk()
+        return self._candidates
+
+    def _walk(self) -> List[str]:
+        gitignore = GitIgnore(self.directory_path)
+        files = []
+        for root, dirs, names in os.walk(self.directory_path):
+            rel_root = os.path.relpath(root, self.directory_path)
+            rel_root = "" if rel_root == "." else rel_root
+            dirs[:] = [
+                d for d in dirs
+                if d not in IGNORED_DIRS and not gitignore.ignored(os.path.join(rel_root, d), True)
+            ]
+            for name in names:
+                if name in LOCKFILES or name.endswith(".lock"):
+                    continue
+                if gitignore.ignored(os.path.join(rel_root, name), False):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getsize(path) > self.max_file_size:
+                        continue
+                except OSError:
+                    continue
+                if is_binary(path):
+                    continue
+                files.append(path)
+        return files
+
+    def read_files(self) -> List[dict]:
+        index = get_file_index(self.directory_path)
+        files = []
+        for path in self.candidate_files():
+            code = index.read(os.path.abspath(path))
+            if code is not None:
+                files.append({"filename": path, "code": code})
+        return files
+
+    def rank(self, files: List[dict], query: str, vector_scores: Optional[dict] = None) -> List[dict]:
+        """
+        TF-IDF overlap between the query and each file (its path counts too),
+        plus the vector index similarity of its best chunk when one is given,
+        keyed on the path relative to the project.
+        """
+        query_terms = set(tokenize(query))
+        vector_scores = vector_scores or {}
+        file_terms = []
+        df = Counter()
+        for file in files:
+            rel_path = os.path.relpath(file["filename"], self.directory_path)
+            terms = Counter(tokenize(file["code"]))
+            terms.update({term: 3 for term in tokenize(rel_path.replace("/", " ").replace(".", " "))})
+            file_terms.append(terms)
+            df.update(term for term in query_terms if term in terms)
+
+        n = len(files)
+        scored = []
+        for file, terms in zip(files, file_terms):
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term, 0)
+                if tf:
+                    score += (1 + math.log(tf)) * math.log(1 + n / df[term])
+            score /= math.log(2 + sum(terms.values()))
+            score += VECTOR_WEIGHT * vector_scores.get(rel_path, 0.0)
+            scored.append((score, file))
+
+        # Relevance first, then shorter files, so more of them fit the budget
+        scored.sort(key=lambda item: (-item[0], len(item[1]["code"])))
+        return [file for _, file in scored]
+
+    def build(self, conversation: List[str], index=None) -> str:
+        query = "\n".join(conversation[-RECENT_MESSAGES:])
+        files = self.read_files()
+
+        vector_scores = {}
+        if index is not None and query:
+            for chunk in index.search(query, top_k=Config().get_rag_top_k() * 4):
+                source = chunk["source"]
+                # research results indexed by older versions are not project files
+                if source.startswith("research:"):
+                    continue
+                vector_scores[source] = max(vector_scores.get(source, 0.0), chunk["score"])
+
+        markdown = []
+        remaining = self.token_budget
+        for file in self.rank(files, query, vector_scores):
+            # Paths relative to the project, as the agents name files in their responses
+            rel_path = os.path.relpath(file["filename"], self.directory_path)
+            section = f"### {rel_path}:\n\n```\n{file['code']}\n```\n\n---\n\n"
+            # Cheap lower bound before paying for the exact count
+            if len(section) // 8 > remaining:
+                continue
+            tokens = len(self.encoding.encode(section, disallowed_special=()))
+            if tokens > remaining:
+                continue
+            markdown.append(section)
+            remaining -= tokens
+            if remaining <= 0:
+                break
+
+        return "".join(markdown)
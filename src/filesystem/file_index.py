@@ -0,0 +1,158 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# Upper bound on file contents held in memory across all projects
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+SKIPPED_DIRS = {".git", "node_modules", "__pycache__"}
+
+_contents: "OrderedDict[str, Tuple[int, int, Optional[str]]]" = OrderedDict()
+_contents_bytes = 0
+_contents_lock = Lock()
+
+
+def _cached_read(path: str, mtime_ns: int, size: int) -> Optional[str]:
+    """
+    Contents of `path`, read from disk only when its mtime or size changed since
+    the cached copy. Files that are not text are cached as `None`.
+    """
+    global _contents_bytes
+    with _contents_lock:
+        cached = _contents.get(path)
+        if cached is not None and cached[:2] == (mtime_ns, size):
+            _contents.move_to_end(path)
+            return cached[2]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError):
+        code = None
+
+    with _contents_lock:
+        old = _contents.pop(path, None)
+        if old is not None:
+            _contents_bytes -= old[1]
+        if size <= MAX_CACHED_BYTES:
+            _contents[path] = (mtime_ns, size, code)
+            _contents_bytes += size
+            while _contents_bytes > MAX_CACHED_BYTES:
+                _, (_, evicted_size, _) = _contents.popitem(last=False)
+                _contents_bytes -= evicted_size
+    return code
+
+
+class FileIndex:
+    """
+    Snapshot of a project tree keyed on path, mtime and size. A rescan only
+    stats the tree; contents are re-read for the files that changed. With
+    watchdog installed, filesystem events tell when a rescan is needed at all.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries: Dict[str, Tuple[int, int]] = {}
+        self.lock = Lock()
+        self.dirty = True
+        self.observer = None
+        self.watch_failed = Observer is None
+
+    def _watch(self):
+        if self.watch_failed or not os.path.isdir(self.directory):
+            return
+        index = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                index.dirty = True
+
+        try:
+            self.observer = Observer()
+            self.observer.daemon = True
+            self.observer.schedule(Handler(), self.directory, recursive=True)
+            self.observer.start()
+        except OSError:
+            # e.g. inotify watch limit reached: fall back to stat scans
+            self.observer = None
+            self.watch_failed = True
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        with self.lock:
+            if self.observer is None:
+                self._watch()
+            elif not self.dirty:
+                return self.entries
+            self.dirty = False
+
+            entries = {}
+            stack = [self.directory]
+            while stack:
+                try:
+                    it = os.scandir(stack.pop())
+                except OSError:
+                    continue
+                with it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in SKIPPED_DIRS:
+                                    stack.append(entry.path)
+                            elif entry.is_file():
+                                stat = entry.stat()
+                                entries[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                        except OSError:
+                            pass
+            self.entries = entries
+            return entries
+
+    def read(self, path: str) -> Optional[str]:
+        """
+        Current contents of a single file. It is stat'ed here rather than trusted
+        from the last scan, so callers that do not scan first never get a stale copy.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return _cached_read(path, stat.st_mtime_ns, stat.st_size)
+
+    def files(self) -> List[dict]:
+        """
+        Every text file in the tree as `{"path", "relative_path", "code"}`, in path order.
+        """
+        files = []
+        for path, (mtime_ns, size) in sorted(self.scan().items()):
+            code = _cached_read(path, mtime_ns, size)
+            if code is None:
+                continue
+            files.append({
+                "path": path,
+                "relative_path": os.path.relpath(path, self.directory),
+                "code": code
+            })
+        return files
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer = None
+
+
+_indexes: Dict[str, FileIndex] = {}
+_indexes_lock = Lock()
+
+
+def get_file_index(directory: str) -> FileIndex:
+    directory = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = FileIndex(directory)
+            _indexes[directory] = index
+        return index
@@ -1,6 +1,7 @@
 import os
 
 from src.config import Config
+from src.filesystem.file_index import get_file_index
 
 """
 TODO: Replace this with `code2prompt` - https://github.com/mufeedvh/code2prompt
@@ -13,23 +14,16 @@ class ReadCode:
         self.directory_path = os.path.join(project_path, project_name.lower().replace(" ", "-"))
 
     def read_directory(self):
-        files_list = []
-        for root, _dirs, files in os.walk(self.directory_path):
-            for file in files:
-                try:
-                    file_path = os.path.join(root, file)
-                    with open(file_path, 'r') as file_content:
-                        files_list.append({"filename": file_path, "code": file_content.read()})
-                except:
-                    pass
-
-        return files_list
+        return [
+            {"filename": os.path.join(self.directory_path, file["relative_path"]), "code": file["code"]}
+            for file in get_file_index(self.directory_path).files()
+        ]
 
     def code_set_to_markdown(self):
-        code_set = self.read_directory()
-        markdown = ""
-        for code in code_set:
-            markdown += f"### {code['filename']}:\n\n"
-            markdown += f"```\n{code['code']}\n```\n\n"
-            markdown += "---\n\n"
-        return markdown
+        markdown = []
+        # Paths relative to the project, as the agents name files in their responses
+        for file in get_file_index(self.directory_path).files():
+            markdown.append(f"### {file['relative_path']}:\n\n")
+            markdown.append(f"```\n{file['code']}\n```\n\n")
+            markdown.append("---\n\n")
+        return "".join(markdown)
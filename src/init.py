@@ -16,6 +16,7 @@ def init_devika():
     pdfs_dir = config.get_pdfs_dir()
     projects_dir = config.get_projects_dir()
     logs_dir = config.get_logs_dir()
+    rag_dir = config.get_rag_dir()
 
     logger.info("Initializing Prerequisites Jobs...")
     os.makedirs(os.path.dirname(sqlite_db), exist_ok=True)
@@ -23,10 +24,15 @@ def init_devika():
     os.makedirs(pdfs_dir, exist_ok=True)
     os.makedirs(projects_dir, exist_ok=True)
     os.makedirs(logs_dir, exist_ok=True)
+    os.makedirs(rag_dir, exist_ok=True)
 
-    from src.bert.sentence import SentenceBert
+    from src.database import init_database
+
+    logger.info("Initializing database...")
+    init_database()
+
+    from src.bert.sentence import get_kw_model
 
     logger.info("Loading sentence-transformer BERT models...")
-    prompt = "Light-weight keyword extraction exercise for BERT model loading.".strip()
-    SentenceBert(prompt).extract_keywords()
+    get_kw_model()
     logger.info("BERT model loaded successfully.")
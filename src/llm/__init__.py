@@ -1 +1,4 @@
-from .llm import LLM
\ No newline at end of file
+from .llm import LLM
+from .rate_limiter import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from .usage import token_counter
+from .resilience import LLMError, InferenceTimeoutError, InferenceFailedError
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Response cache for `LLM.inference`. Every prompt is sent at temperature 0, so a
+response can be reused for the same (provider, model, prompt). Entries expire
+after a TTL and the least recently used ones are evicted above a size bound.
+"""
+import hashlib
+import time
+from threading import Lock, local
+from typing import Optional
+
+from sqlmodel import Field, Session, SQLModel
+
+from src.config import Config
+from src.database import get_engine
+
+
+class LLMResponseCache(SQLModel, table=True):
+    __tablename__ = "llm_response_cache"
+
+    key: str = Field(primary_key=True)
+    provider: str
+    model: str
+    response: str
+    created_at: float
+    last_access: float = Field(index=True)
+
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = Lock()
+# key of the last response served or stored by the current thread, see `discard_last_response`
+_last_key = local()
+
+
+def _count(stat: str, amount: int = 1):
+    with _stats_lock:
+        _stats[stat] += amount
+
+
+class ResponseCache:
+    def __init__(self):
+        config = Config()
+        self.enabled = config.get_llm_cache()
+        self.ttl = config.get_llm_cache_ttl()
+        self.max_entries = config.get_llm_cache_max_entries()
+        self.engine = get_engine()
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{provider}\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, provider: str, model: str, prompt: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = self.make_key(provider, model, prompt)
+        now = time.time()
+        with Session(self.engine) as session:
+            entry = session.get(LLMResponseCache, key)
+            if entry and now - entry.created_at > self.ttl:
+                session.delete(entry)
+                session.commit()
+                _count("evictions")
+                entry = None
+            if not entry:
+                _count("misses")
+                return None
+            entry.last_access = now
+            response = entry.response
+            session.commit()
+        _count("hits")
+        _last_key.value = key
+        return response
+
+    def put(self, provider: str, model: str, prompt: str, response: str):
+        if not self.enabled or not response:
+            return
+        key = self.make_key(provider, model, prompt)
+        now = time.time()
+        with Session(self.engine) as session:
+            session.merge(LLMResponseCache(
+                key=key,
+                provider=provider,
+                model=model,
+                response=response,
+                created_at=now,
+                last_access=now
+            ))
+            session.commit()
+            self.evict(session)
+        _last_key.value = key
+
+    def evict(self, session: Session):
+        """
+        Drop expired entries, then the least recently used ones above `max_entries`.
+        """
+        expired = session.query(LLMResponseCache) \
+            .filter(LLMResponseCache.created_at < time.time() - self.ttl) \
+            .delete()
+        overflow = session.query(LLMResponseCache).count() - self.max_entries
+        if overflow > 0:
+            lru_keys = session.query(LLMResponseCache.key) \
+                .order_by(LLMResponseCache.last_access) \
+                .limit(overflow)
+            session.query(LLMResponseCache) \
+                .filter(LLMResponseCache.key.in_(lru_keys.scalar_subquery())) \
+                .delete(synchronize_session=False)
+        session.commit()
+        _count("evictions", expired + max(overflow, 0))
+
+    def discard(self, key: str):
+        with Session(self.engine) as session:
+            entry = session.get(LLMResponseCache, key)
+            if entry:
+                session.delete(entry)
+                session.commit()
+
+    def stats(self) -> dict:
+        with _stats_lock:
+            stats = dict(_stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        if self.enabled:
+            with Session(self.engine) as session:
+                stats["entries"] = session.query(LLMResponseCache).count()
+        return stats
+
+
+def discard_last_response():
+    """
+    Forget the response last served or stored by this thread. Called when an agent
+    rejects a response, so that its retry goes to the provider instead of the cache.
+    """
+    key = getattr(_last_key, "value", None)
+    if key:
+        _last_key.value = None
+        ResponseCache().discard(key)
@@ -1,6 +1,10 @@
+import json
+from typing import Iterator
+
 from anthropic import Anthropic
 
 from src.config import Config
+from .usage import report_usage
 
 class Claude:
     def __init__(self):
@@ -8,6 +12,7 @@ class Claude:
         api_key = config.get_claude_api_key()
         self.client = Anthropic(
             api_key=api_key,
+            timeout=config.get_timeout_inference(),
         )
 
     def inference(self, model_id: str, prompt: str) -> str:
@@ -23,4 +28,52 @@ class Claude:
             temperature=0
         )
 
+        report_usage(message.usage.input_tokens, message.usage.output_tokens)
+        return message.content[0].text
+
+    def inference_json(self, model_id: str, prompt: str, schema: dict) -> str:
+        """
+        Claude has no JSON mode; forcing a tool call whose input schema is the
+        response schema gets the same guarantee.
+        """
+        name = schema.get("title", "response")
+        message = self.client.messages.create(
+            max_tokens=4096,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0,
+            tools=[{
+                "name": name,
+                "description": "Submit the response in the requested format.",
+                "input_schema": schema
+            }],
+            tool_choice={"type": "tool", "name": name}
+        )
+
+        report_usage(message.usage.input_tokens, message.usage.output_tokens)
+        for block in message.content:
+            if block.type == "tool_use":
+                return json.dumps(block.input)
         return message.content[0].text
+
+    def stream(self, model_id: str, prompt: str) -> Iterator[str]:
+        with self.client.messages.stream(
+            max_tokens=4096,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+            usage = stream.get_final_message().usage
+            report_usage(usage.input_tokens, usage.output_tokens)
@@ -1,24 +1,47 @@
+from typing import Iterator
+
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
 from src.config import Config
+from .usage import report_usage
+
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    # You can adjust other categories as needed
+}
+
+
+def report_gemini_usage(response):
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        report_usage(metadata.prompt_token_count, metadata.candidates_token_count)
+
 
 class Gemini:
     def __init__(self):
         config = Config()
         api_key = config.get_gemini_api_key()
         genai.configure(api_key=api_key)
+        self.request_options = {"timeout": config.get_timeout_inference()}
+        self.models = {}
+
+    def get_model(self, model_id: str, json_mode: bool = False):
+        key = (model_id, json_mode)
+        if key not in self.models:
+            if json_mode:
+                config = genai.GenerationConfig(temperature=0, response_mime_type="application/json")
+            else:
+                config = genai.GenerationConfig(temperature=0)
+            self.models[key] = genai.GenerativeModel(model_id, generation_config=config)
+        return self.models[key]
 
     def inference(self, model_id: str, prompt: str) -> str:
-        config = genai.GenerationConfig(temperature=0)
-        model = genai.GenerativeModel(model_id, generation_config=config)
-        # Set safety settings for the request
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            # You can adjust other categories as needed
-        }
-        response = model.generate_content(prompt, safety_settings=safety_settings)
+        model = self.get_model(model_id)
+        response = model.generate_content(prompt, safety_settings=SAFETY_SETTINGS,
+                                          request_options=self.request_options)
+        report_gemini_usage(response)
         try:
             # Check if the response contains text
             return response.text
@@ -31,3 +54,26 @@ class Gemini:
             print("Safety ratings:", response.candidates[0].safety_ratings)
             # Handle the error or return an appropriate message
             return "Error: Unable to generate content Gemini API"
+
+    def inference_json(self, model_id: str, prompt: str, schema: dict) -> str:
+        model = self.get_model(model_id, json_mode=True)
+        response = model.generate_content(prompt, safety_settings=SAFETY_SETTINGS,
+                                          request_options=self.request_options)
+        report_gemini_usage(response)
+        try:
+            return response.text
+        except ValueError:
+            print("Prompt feedback:", response.prompt_feedback)
+            return "Error: Unable to generate content Gemini API"
+
+    def stream(self, model_id: str, prompt: str) -> Iterator[str]:
+        model = self.get_model(model_id)
+        response = model.generate_content(prompt, safety_settings=SAFETY_SETTINGS, stream=True,
+                                          request_options=self.request_options)
+        for chunk in response:
+            try:
+                yield chunk.text
+            except ValueError:
+                # blocked or empty chunk, see `inference` for the details
+                continue
+        report_gemini_usage(response)
@@ -1,13 +1,16 @@
+from typing import Iterator
+
 from groq import Groq as _Groq
 
 from src.config import Config
+from .usage import report_usage
 
 
 class Groq:
     def __init__(self):
         config = Config()
         api_key = config.get_groq_api_key()
-        self.client = _Groq(api_key=api_key)
+        self.client = _Groq(api_key=api_key, timeout=config.get_timeout_inference())
 
     def inference(self, model_id: str, prompt: str) -> str:
         chat_completion = self.client.chat.completions.create(
@@ -21,4 +24,39 @@ class Groq:
             temperature=0
         )
 
+        if chat_completion.usage:
+            report_usage(chat_completion.usage.prompt_tokens, chat_completion.usage.completion_tokens)
+        return chat_completion.choices[0].message.content
+
+    def inference_json(self, model_id: str, prompt: str, schema: dict) -> str:
+        chat_completion = self.client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+
+        if chat_completion.usage:
+            report_usage(chat_completion.usage.prompt_tokens, chat_completion.usage.completion_tokens)
         return chat_completion.choices[0].message.content
+
+    def stream(self, model_id: str, prompt: str) -> Iterator[str]:
+        chunks = self.client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0,
+            stream=True
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
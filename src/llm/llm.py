@@ -1,9 +1,16 @@
-import sys
+import time
+import concurrent.futures
+from threading import Event, Lock
 
-import tiktoken
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 from src.socket_instance import emit_agent
+from .cache import ResponseCache
+from .ticker import ticker
+from .usage import estimate_tokens, take_reported_usage, token_counter
+from .rate_limiter import PRIORITY_NORMAL, rate_limiter
+from .resilience import (InferenceFailedError, InferenceTimeoutError, backoff_delay, is_rate_limited,
+                         is_retryable, latency_tracker, retry_after)
 from .ollama_client import Ollama
 from .claude_client import Claude
 from .openai_client import OpenAi
@@ -11,24 +18,96 @@ from .gemini_client import Gemini
 from .mistral_client import MistralAi
 from .groq_client import Groq
 
-from src.state import AgentState
-
 from src.config import Config
 from src.logger import Logger
 
-TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
-
 ollama = Ollama()
 logger = Logger()
-agentState = AgentState()
 config = Config()
 
+# Provider clients hold their own HTTP connection pools, so they are built once and
+# reused. Each one is keyed on the provider and on the config values it was built
+# from, so changing an API key or endpoint in the settings builds a fresh client.
+CLIENT_FACTORIES: Dict[str, Tuple[Callable[[], object], Callable[[], tuple]]] = {
+    "OLLAMA": (Ollama, lambda: (config.get_ollama_api_endpoint(), config.get_timeout_inference())),
+    "CLAUDE": (Claude, lambda: (config.get_claude_api_key(), config.get_timeout_inference())),
+    "OPENAI": (OpenAi, lambda: (config.get_openai_api_key(), config.get_openai_api_base_url(),
+                                config.get_timeout_inference())),
+    "GOOGLE": (Gemini, lambda: (config.get_gemini_api_key(), config.get_timeout_inference())),
+    "MISTRAL": (MistralAi, lambda: (config.get_mistral_api_key(), config.get_timeout_inference())),
+    "GROQ": (Groq, lambda: (config.get_groq_api_key(), config.get_timeout_inference())),
+}
+
+_clients = {("OLLAMA", CLIENT_FACTORIES["OLLAMA"][1]()): ollama}
+_clients_lock = Lock()
+
+# shared by all inferences of the process instead of a pool per request
+INFERENCE_MAX_WORKERS = 16
+_inference_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=INFERENCE_MAX_WORKERS,
+    thread_name_prefix="llm-inference"
+)
+
+
+# minimum delay between two "stream" socket events of the same inference
+STREAM_EMIT_INTERVAL = 0.1
+# how long past the clients' own timeout a request may run before it is abandoned
+DEADLINE_GRACE = 5
+# Requests abandoned by their caller (timed out, or a lost hedge) still hold a
+# worker until they end. No hedge is sent while this many are still running, so
+# they cannot starve the pool for every other project.
+MAX_ABANDONED = INFERENCE_MAX_WORKERS // 4
+
+_abandoned = set()
+_abandoned_lock = Lock()
+
+
+def abandon(future: concurrent.futures.Future):
+    """
+    Give up on a request: drop it if it has not started yet, otherwise track
+    its worker until the request ends.
+    """
+    if future.cancel() or future.done():
+        return
+    with _abandoned_lock:
+        _abandoned.add(future)
+
+    def release(done_future):
+        with _abandoned_lock:
+            _abandoned.discard(done_future)
+
+    future.add_done_callback(release)
+
+
+def abandoned_count() -> int:
+    with _abandoned_lock:
+        return len(_abandoned)
+
+
+def get_client(model_enum: str):
+    factory, config_key = CLIENT_FACTORIES[model_enum]
+    key = (model_enum, config_key())
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # drop the client built from the previous config of this provider
+            for stale_key in [k for k in _clients if k[0] == model_enum]:
+                del _clients[stale_key]
+            client = factory()
+            _clients[key] = client
+        return client
+
 
 class LLM:
     def __init__(self, model_id: str = None):
         self.model_id = model_id
         self.log_prompts = config.get_logging_prompts()
         self.timeout_inference = config.get_timeout_inference()
+        self.stream = config.get_llm_stream()
+        self.json_mode = config.get_llm_json_mode()
+        self.max_retries = config.get_llm_max_retries()
+        self.hedge = config.get_llm_hedge()
+        self.cache = ResponseCache()
         self.models = {
             "CLAUDE": [
                 ("Claude 3 Opus", "claude-3-opus-20240229"),
@@ -74,15 +153,141 @@ class LLM:
         return model_dict.get(model_name, (None, None))
 
     @staticmethod
-    def update_global_token_usage(string: str, project_name: str):
-        token_usage = len(TIKTOKEN_ENC.encode(string))
-        agentState.update_token_usage(project_name, token_usage)
+    def stream_inference(model, model_name: str, prompt: str, project_name: str,
+                         on_token: Optional[Callable[[str], None]] = None, cancelled: Optional[Event] = None) -> str:
+        """
+        Consume the provider's token stream. Tokens are handed to `on_token` as they
+        arrive (from the inference thread) and forwarded to the UI in batches; the
+        first batch of a response is flagged `new` so the UI starts a fresh one.
+        Stops reading, and frees its worker, at the next token once `cancelled` is set.
+        """
+        response = []
+        pending = []
+        last_emit = time.time()
+
+        def emit_pending():
+            emit_agent("inference", {
+                "type": "stream",
+                "project_name": project_name,
+                "tokens": "".join(pending),
+                "new": len(response) == len(pending)
+            }, False)
 
-        total = agentState.get_latest_token_usage(project_name) + token_usage
-        emit_agent("tokens", {"token_usage": total})
+        for token in model.stream(model_name, prompt):
+            if cancelled is not None and cancelled.is_set():
+                break
+            response.append(token)
+            pending.append(token)
+            if on_token:
+                on_token(token)
+            if time.time() - last_emit >= STREAM_EMIT_INTERVAL:
+                emit_pending()
+                pending = []
+                last_emit = time.time()
+        if pending:
+            emit_pending()
+        return "".join(response)
 
-    def inference(self, prompt: str, project_name: str) -> str:
-        self.update_global_token_usage(prompt, project_name)
+    def candidates(self) -> List[Tuple[str, str]]:
+        """
+        The selected model followed by the configured fallback chain, as
+        (provider, model name) pairs.
+        """
+        chain = []
+        for model_id in [self.model_id] + config.get_llm_fallback_models():
+            model_enum, model_name = self.model_enum(model_id)
+            if model_enum is not None and (model_enum, model_name) not in chain:
+                chain.append((model_enum, model_name))
+        return chain
+
+    def call_model(self, model_enum: str, model_name: str, prompt: str, project_name: str,
+                   on_token: Optional[Callable[[str], None]] = None, schema: Optional[dict] = None,
+                   prompt_tokens: int = 0, priority: int = PRIORITY_NORMAL) -> Tuple[str, Optional[Tuple[int, int]]]:
+        """
+        A single request to one provider, sent once the model's rate limit has
+        budget for it. Once the request is slower than the model's p95 latency a
+        duplicate is sent (if hedging is on, nothing was streamed and the budget
+        allows it right away) and whichever answers first wins. The requests
+        left behind are abandoned, and a stream stops reading.
+
+        Returns the response and the (prompt, completion) tokens the provider
+        reported, if any.
+        """
+        model = get_client(model_enum)
+
+        def with_usage(func, *args):
+            # the clients report usage on the thread that ran the request
+            take_reported_usage()
+            return func(*args), take_reported_usage()
+
+        waited = rate_limiter.acquire(model_enum, model_name, prompt_tokens, priority)
+        if waited >= 1:
+            logger.info(f"Waited {waited:.2f}s for the {model_enum} {model_name} rate limit")
+
+        streaming = False
+        cancelled = Event()
+        if schema and self.json_mode:
+            submit = lambda: _inference_executor.submit(with_usage, model.inference_json, model_name, prompt, schema)
+        elif self.stream or on_token:
+            streaming = True
+            submit = lambda: _inference_executor.submit(
+                with_usage, self.stream_inference, model, model_name, prompt, project_name, on_token, cancelled)
+        else:
+            submit = lambda: _inference_executor.submit(with_usage, model.inference, model_name, prompt)
+        hedge_after = latency_tracker.p95(model_enum, model_name) if self.hedge and not streaming else None
+
+        start_time = time.time()
+        # the SDK clients enforce the timeout themselves; this is only a backstop
+        deadline = start_time + self.timeout_inference + DEADLINE_GRACE
+        futures = [submit()]
+        inference_id = ticker.start()
+        try:
+            while True:
+                wait_until = deadline
+                if hedge_after is not None and len(futures) == 1:
+                    wait_until = min(deadline, start_time + hedge_after)
+                done, _ = concurrent.futures.wait(
+                    futures, timeout=max(0, wait_until - time.time()),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    if future.exception() is None:
+                        latency_tracker.record(model_enum, model_name, time.time() - start_time)
+                        return future.result()
+                if done and len(done) == len(futures):
+                    raise next(iter(done)).exception()
+                # a failed hedge leaves the other request running
+                futures = [future for future in futures if future not in done]
+
+                if time.time() >= deadline:
+                    raise InferenceTimeoutError(
+                        f"{model_enum} {model_name} took longer than {self.timeout_inference}s")
+                if hedge_after is not None and len(futures) == 1 and not done:
+                    if abandoned_count() < MAX_ABANDONED and \
+                            rate_limiter.try_acquire(model_enum, model_name, prompt_tokens):
+                        logger.info(f"Hedging request to {model_enum} {model_name} after {hedge_after:.2f}s")
+                        futures.append(submit())
+                    hedge_after = None
+        finally:
+            ticker.stop(inference_id)
+            # the request that timed out, or the hedge that lost
+            cancelled.set()
+            for future in futures:
+                abandon(future)
+
+    def inference(self, prompt: str, project_name: str, on_token: Optional[Callable[[str], None]] = None,
+                  schema: Optional[dict] = None, priority: int = PRIORITY_NORMAL) -> str:
+        """
+        With a JSON `schema`, and JSON mode on, the provider's native JSON or
+        tool-calling mode constrains the response instead of streaming it.
+
+        Requests wait for the provider's rate limit in `priority` order
+        (`PRIORITY_HIGH` first). Transient failures, 429s included, are retried
+        with jittered backoff, then the next model of the fallback chain is
+        tried. Raises `InferenceFailedError` when every model failed.
+        """
+        # only a budget for the rate limiter; the provider's count is charged afterwards
+        prompt_tokens = estimate_tokens(prompt)
 
         model_enum, model_name = self.model_enum(self.model_id)
                 
@@ -90,58 +295,72 @@ class LLM:
         if model_enum is None:
             raise ValueError(f"Model {self.model_id} not supported")
 
-        model_mapping = {
-            "OLLAMA": ollama,
-            "CLAUDE": Claude(),
-            "OPENAI": OpenAi(),
-            "GOOGLE": Gemini(),
-            "MISTRAL": MistralAi(),
-            "GROQ": Groq()
-        }
+        cached_response = self.cache.get(model_enum, model_name, prompt)
+        if cached_response is not None:
+            logger.info(f"Using cached response. Model: {model_enum}, Model ID: {self.model_id}")
+            if on_token:
+                on_token(cached_response)
+            token_counter.add_text(project_name, prompt)
+            token_counter.add_text(project_name, cached_response)
+            return cached_response
 
-        try:
-            import concurrent.futures
-            import time
-
-            start_time = time.time()
-            model = model_mapping[model_enum]
-            
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(model.inference, model_name, prompt)
+        errors = []
+        response = None
+        usage = None
+        streamed = False
+
+        def forward(token: str):
+            nonlocal streamed
+            streamed = True
+            on_token(token)
+
+        for candidate_enum, candidate_name in self.candidates():
+            if errors:
+                emit_agent("inference", {"type": "warning", "message": f"Falling back to {candidate_enum} {candidate_name}"})
+            for attempt in range(self.max_retries + 1):
                 try:
-                    while True:
-                        elapsed_time = time.time() - start_time
-                        elapsed_seconds = format(elapsed_time, ".2f")
-                        emit_agent("inference", {"type": "time", "elapsed_time": elapsed_seconds})
-                        if int(elapsed_time) == 5:
-                            emit_agent("inference", {"type": "warning", "message": "Inference is taking longer than expected"})
-                        if elapsed_time > self.timeout_inference:
-                            raise concurrent.futures.TimeoutError
-                        if future.done():
-                            break
-                        time.sleep(0.5)
-
-                    response = future.result(timeout=self.timeout_inference).strip()
-
-                except concurrent.futures.TimeoutError:
-                    logger.error(f"Inference failed. took too long. Model: {model_enum}, Model ID: {self.model_id}")
-                    emit_agent("inference", {"type": "error", "message": "Inference took too long. Please try again."})
-                    response = False
-                    sys.exit()
-                
+                    response, usage = self.call_model(candidate_enum, candidate_name, prompt, project_name,
+                                                      forward if on_token else None, schema,
+                                                      prompt_tokens, priority)
+                    response = response.strip()
+                    break
                 except Exception as e:
-                    logger.error(str(e))
-                    response = False
-                    emit_agent("inference", {"type": "error", "message": str(e)})
-                    sys.exit()
-
+                    logger.error(f"Inference failed. Model: {candidate_enum} {candidate_name}, attempt {attempt + 1}: {e}")
+                    errors.append((f"{candidate_enum} {candidate_name}", e))
+                    # tokens already handed out cannot be taken back
+                    if streamed:
+                        break
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        break
+                    if is_rate_limited(e):
+                        # the limiter holds back every caller of this model, not just this one
+                        delay = retry_after(e) or backoff_delay(attempt)
+                        emit_agent("inference", {"type": "warning",
+                                                 "message": f"Rate limited by {candidate_enum}, retrying in {delay:.0f}s"})
+                        # without a limiter for the model, this caller waits on its own
+                        if not rate_limiter.pause(candidate_enum, candidate_name, delay):
+                            time.sleep(delay)
+                        continue
+                    time.sleep(backoff_delay(attempt))
+            if response is not None or streamed:
+                break
 
-        except KeyError:
-            raise ValueError(f"Model {model_enum} not supported")
+        if response is None:
+            error = InferenceFailedError(errors)
+            emit_agent("inference", {"type": "error", "message": str(error)})
+            raise error
 
         if self.log_prompts:
-            logger.debug(f"Response ({model}): --> {response}")
+            logger.debug(f"Response ({candidate_enum} {candidate_name}): --> {response}")
 
-        self.update_global_token_usage(response, project_name)
+        if usage:
+            rate_limiter.record(candidate_enum, candidate_name, usage[0] - prompt_tokens + usage[1])
+            token_counter.add(project_name, usage[0] + usage[1])
+        else:
+            rate_limiter.record(candidate_enum, candidate_name, estimate_tokens(response))
+            token_counter.add_text(project_name, prompt)
+            token_counter.add_text(project_name, response)
+        # keyed on the model that answered, which is not the primary one after a fallback
+        self.cache.put(candidate_enum, candidate_name, prompt, response)
 
         return response
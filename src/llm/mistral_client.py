@@ -1,14 +1,17 @@
+from typing import Iterator
+
 from mistralai.client import MistralClient
 from mistralai.models.chat_completion import ChatMessage
 
 from src.config import Config
+from .usage import report_usage
 
 
 class MistralAi:
     def __init__(self):
         config = Config()
         api_key = config.get_mistral_api_key()
-        self.client = MistralClient(api_key=api_key)
+        self.client = MistralClient(api_key=api_key, timeout=config.get_timeout_inference())
 
     def inference(self, model_id: str, prompt: str) -> str:
         print("prompt", prompt.strip())
@@ -19,4 +22,31 @@ class MistralAi:
             ],
             temperature=0
         )
+        if chat_completion.usage:
+            report_usage(chat_completion.usage.prompt_tokens, chat_completion.usage.completion_tokens)
+        return chat_completion.choices[0].message.content
+
+    def inference_json(self, model_id: str, prompt: str, schema: dict) -> str:
+        chat_completion = self.client.chat(
+            model=model_id,
+            messages=[
+                ChatMessage(role="user", content=prompt.strip())
+            ],
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        if chat_completion.usage:
+            report_usage(chat_completion.usage.prompt_tokens, chat_completion.usage.completion_tokens)
         return chat_completion.choices[0].message.content
+
+    def stream(self, model_id: str, prompt: str) -> Iterator[str]:
+        chunks = self.client.chat_stream(
+            model=model_id,
+            messages=[
+                ChatMessage(role="user", content=prompt.strip())
+            ],
+            temperature=0
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -1,6 +1,9 @@
 import ollama
+from typing import Iterator
+
 from src.logger import Logger
 from src.config import Config
+from .usage import report_usage
 
 log = Logger()
 
@@ -8,7 +11,8 @@ log = Logger()
 class Ollama:
     def __init__(self):
         try:
-            self.client = ollama.Client(Config().get_ollama_api_endpoint())
+            config = Config()
+            self.client = ollama.Client(config.get_ollama_api_endpoint(), timeout=config.get_timeout_inference())
             self.models = self.client.list()["models"]
             log.info("Ollama available")
         except:
@@ -22,4 +26,26 @@ class Ollama:
             prompt=prompt.strip(),
             options={"temperature": 0}
         )
+        report_usage(response.get('prompt_eval_count'), response.get('eval_count'))
+        return response['response']
+
+    def inference_json(self, model_id: str, prompt: str, schema: dict) -> str:
+        response = self.client.generate(
+            model=model_id,
+            prompt=prompt.strip(),
+            options={"temperature": 0},
+            format="json"
+        )
+        report_usage(response.get('prompt_eval_count'), response.get('eval_count'))
         return response['response']
+
+    def stream(self, model_id: str, prompt: str) -> Iterator[str]:
+        for chunk in self.client.generate(
+            model=model_id,
+            prompt=prompt.strip(),
+            options={"temperature": 0},
+            stream=True
+        ):
+            yield chunk['response']
+            if chunk.get('done'):
+                report_usage(chunk.get('prompt_eval_count'), chunk.get('eval_count'))
@@ -1,6 +1,9 @@
+from typing import Iterator
+
 from openai import OpenAI
 
 from src.config import Config
+from .usage import report_usage
 
 
 class OpenAi:
@@ -8,7 +11,7 @@ class OpenAi:
         config = Config()
         api_key = config.get_openai_api_key()
         base_url = config.get_openai_api_base_url()
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=config.get_timeout_inference())
 
     def inference(self, model_id: str, prompt: str) -> str:
         chat_completion = self.client.chat.completions.create(
@@ -21,4 +24,38 @@ class OpenAi:
             model=model_id,
             temperature=0
         )
+        if chat_completion.usage:
+            report_usage(chat_completion.usage.prompt_tokens, chat_completion.usage.completion_tokens)
         return chat_completion.choices[0].message.content
+
+    def inference_json(self, model_id: str, prompt: str, schema: dict) -> str:
+        chat_completion = self.client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        if chat_completion.usage:
+            report_usage(chat_completion.usage.prompt_tokens, chat_completion.usage.completion_tokens)
+        return chat_completion.choices[0].message.content
+
+    def stream(self, model_id: str, prompt: str) -> Iterator[str]:
+        chunks = self.client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0,
+            stream=True
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,157 @@
+"""
+Process-wide request and token budgets per (provider, model). Every inference
+takes one request and its prompt tokens from the model's buckets before it is
+sent, waiting in a priority queue when the budget is spent, and pays for its
+completion tokens afterwards. A 429 pauses the model until the provider's
+`retry-after`.
+"""
+import heapq
+import time
+from itertools import count
+from threading import Condition, Lock
+from typing import Dict, List, Optional, Tuple
+
+from src.config import Config
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        # a request larger than the whole budget goes through on a full bucket
+        amount = min(amount, self.capacity)
+        self.refill()
+        if self.level >= amount:
+            return 0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        # may go below zero: completion tokens are only known afterwards
+        self.refill()
+        self.level -= amount
+
+
+class ModelLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.condition = Condition()
+        self.waiters: List[Tuple[int, int]] = []
+
+    def delay(self, tokens: int) -> float:
+        delay = max(0.0, self.paused_until - time.monotonic())
+        if self.requests:
+            delay = max(delay, self.requests.time_until(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.time_until(tokens))
+        return delay
+
+    def take(self, requests: int, tokens: int):
+        if self.requests and requests:
+            self.requests.take(requests)
+        if self.tokens and tokens:
+            self.tokens.take(tokens)
+
+
+class RateLimiter:
+    def __init__(self):
+        self.limiters: Dict[Tuple[str, str, int, int], ModelLimiter] = {}
+        self.lock = Lock()
+        self.tickets = count()
+
+    def limiter(self, provider: str, model: str) -> Optional[ModelLimiter]:
+        config = Config()
+        if not config.get_rate_limit_enabled():
+            return None
+        rpm, tpm = config.get_rate_limit(provider)
+        if not rpm and not tpm:
+            return None
+        # keyed on the limits too, so new settings get fresh buckets
+        key = (provider, model, rpm, tpm)
+        with self.lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = ModelLimiter(rpm, tpm)
+                self.limiters[key] = limiter
+            return limiter
+
+    def acquire(self, provider: str, model: str, tokens: int, priority: int = PRIORITY_NORMAL) -> float:
+        """
+        Block until the model has budget for one request of `tokens` prompt
+        tokens; waiters are served by priority, then in arrival order.
+        Returns the time spent waiting.
+        """
+        limiter = self.limiter(provider, model)
+        if limiter is None:
+            return 0.0
+
+        start = time.monotonic()
+        ticket = (priority, next(self.tickets))
+        with limiter.condition:
+            heapq.heappush(limiter.waiters, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if limiter.waiters[0] == ticket:
+                        timeout = limiter.delay(tokens)
+                        if timeout == 0:
+                            limiter.take(1, tokens)
+                            return time.monotonic() - start
+                    limiter.condition.wait(timeout)
+            finally:
+                limiter.waiters.remove(ticket)
+                heapq.heapify(limiter.waiters)
+                limiter.condition.notify_all()
+
+    def try_acquire(self, provider: str, model: str, tokens: int) -> bool:
+        """
+        Take the budget only if it is there right now and nobody is queued for it.
+        """
+        limiter = self.limiter(provider, model)
+        if limiter is None:
+            return True
+        with limiter.condition:
+            if limiter.waiters or limiter.delay(tokens) > 0:
+                return False
+            limiter.take(1, tokens)
+            return True
+
+    def record(self, provider: str, model: str, tokens: int):
+        """
+        Charge the completion tokens of a finished request.
+        """
+        limiter = self.limiter(provider, model)
+        if limiter is None:
+            return
+        with limiter.condition:
+            limiter.take(0, tokens)
+
+    def pause(self, provider: str, model: str, seconds: float) -> bool:
+        """
+        The provider answered 429: hold every request to the model for `seconds`.
+        Returns False when the model is not rate limited, so nothing was paused.
+        """
+        limiter = self.limiter(provider, model)
+        if limiter is None:
+            return False
+        with limiter.condition:
+            limiter.paused_until = max(limiter.paused_until, time.monotonic() + seconds)
+            limiter.condition.notify_all()
+        return True
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,103 @@
+"""
+Failure handling for `LLM.inference`: typed errors in place of exiting the
+agent thread, jittered exponential backoff between attempts, and the latency
+history that decides when a slow request gets a hedged duplicate.
+"""
+import random
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Deque, Dict, List, Optional, Tuple
+
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+# latencies kept per (provider, model), and how many are needed for a p95
+LATENCY_WINDOW = 100
+LATENCY_MIN_SAMPLES = 20
+
+
+class LLMError(Exception):
+    pass
+
+
+class InferenceTimeoutError(LLMError):
+    pass
+
+
+class InferenceFailedError(LLMError):
+    """
+    Every model of the fallback chain failed; `errors` holds (model, error) pairs.
+    """
+    def __init__(self, errors: List[Tuple[str, Exception]]):
+        self.errors = errors
+        details = "; ".join(f"{model}: {error}" for model, error in errors)
+        super().__init__(f"Inference failed on every model ({details})")
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """
+    "Full jitter" backoff: uniform in [0, min(cap, base * 2^attempt)], so
+    clients that failed together do not retry together.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        response = getattr(error, "response", None)
+        code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Seconds the provider asked us to wait, from the `retry-after` header.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Timeouts, dropped connections, rate limiting and server-side errors are
+    worth another attempt; anything else (bad key, unknown model, bad request)
+    is not.
+    """
+    if isinstance(error, (InferenceTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if is_rate_limited(error):
+        return True
+    code = status_code(error)
+    if code is not None:
+        return code >= 500
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+class LatencyTracker:
+    def __init__(self):
+        self.samples: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.lock = Lock()
+
+    def record(self, provider: str, model: str, seconds: float):
+        with self.lock:
+            self.samples[(provider, model)].append(seconds)
+
+    def p95(self, provider: str, model: str) -> Optional[float]:
+        with self.lock:
+            samples = sorted(self.samples.get((provider, model), ()))
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+latency_tracker = LatencyTracker()
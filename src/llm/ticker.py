@@ -0,0 +1,59 @@
+import time
+from itertools import count
+from threading import Condition, Thread
+from typing import Dict
+
+from src.socket_instance import emit_agent
+
+# seconds between two elapsed-time events, whatever the number of inferences
+TICK_INTERVAL = 1.0
+SLOW_INFERENCE_WARNING = 5
+
+
+class InferenceTicker:
+    """
+    One daemon thread reports the elapsed time of the running inferences to the
+    UI, instead of every inference polling and emitting on its own. It sleeps
+    while nothing is running.
+    """
+    def __init__(self):
+        self.running: Dict[int, float] = {}
+        self.warned = set()
+        self.ids = count()
+        self.condition = Condition()
+        self.thread = None
+
+    def start(self) -> int:
+        with self.condition:
+            inference_id = next(self.ids)
+            self.running[inference_id] = time.time()
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name="llm-ticker", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+            return inference_id
+
+    def stop(self, inference_id: int):
+        with self.condition:
+            self.running.pop(inference_id, None)
+            self.warned.discard(inference_id)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.running:
+                    self.condition.wait()
+                # the UI shows one timer: the longest running inference
+                inference_id, started = min(self.running.items(), key=lambda item: item[1])
+                warn = inference_id not in self.warned and time.time() - started >= SLOW_INFERENCE_WARNING
+                if warn:
+                    self.warned.add(inference_id)
+
+            elapsed_seconds = format(time.time() - started, ".2f")
+            emit_agent("inference", {"type": "time", "elapsed_time": elapsed_seconds}, False)
+            if warn:
+                emit_agent("inference", {"type": "warning", "message": "Inference is taking longer than expected"})
+            time.sleep(TICK_INTERVAL)
+
+
+ticker = InferenceTicker()
@@ -0,0 +1,107 @@
+"""
+Token accounting off the inference path. Clients report the usage the provider
+returned through `report_usage`; when a provider reports nothing, the text is
+queued and encoded locally by the flusher thread instead of by the caller.
+Counts are kept in memory per project and added to the agent state, and sent to
+the UI, once per flush interval.
+"""
+import atexit
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+
+from src.config import Config
+from src.socket_instance import emit_agent
+from src.state import AgentState
+
+TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+# rough size of a token, for budgeting a request before it is sent
+CHARS_PER_TOKEN = 4
+
+_reported = threading.local()
+
+
+def report_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    """
+    Called by the clients, from the thread running the request, with the
+    usage the provider returned.
+    """
+    if prompt_tokens is None or completion_tokens is None:
+        return
+    _reported.usage = (prompt_tokens, completion_tokens)
+
+
+def take_reported_usage() -> Optional[Tuple[int, int]]:
+    usage = getattr(_reported, "usage", None)
+    _reported.usage = None
+    return usage
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class TokenCounter:
+    def __init__(self):
+        self.pending: Dict[str, int] = {}
+        self.pending_texts: Dict[str, List[str]] = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.agent_state = AgentState()
+
+    def _start_flusher(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._flush_periodically, name="token-usage", daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(Config().get_llm_usage_flush_interval())
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing token usage: {e}")
+
+    def add(self, project: str, tokens: int):
+        with self.lock:
+            self.pending[project] = self.pending.get(project, 0) + tokens
+            self._start_flusher()
+
+    def add_text(self, project: str, text: str):
+        """
+        Count `text` later, on the flusher thread.
+        """
+        with self.lock:
+            self.pending_texts.setdefault(project, []).append(text)
+            self._start_flusher()
+
+    def total(self, project: str) -> int:
+        with self.lock:
+            return self.agent_state.get_latest_token_usage(project) + self.pending.get(project, 0)
+
+    def flush(self):
+        with self.lock:
+            texts, self.pending_texts = self.pending_texts, {}
+        counted = {
+            project: sum(len(TIKTOKEN_ENC.encode(text)) for text in project_texts)
+            for project, project_texts in texts.items()
+        }
+
+        with self.lock:
+            for project, tokens in counted.items():
+                self.pending[project] = self.pending.get(project, 0) + tokens
+            pending, self.pending = self.pending, {}
+            # updated under the lock so `total` never misses the flushed tokens
+            totals = {}
+            for project, tokens in pending.items():
+                self.agent_state.update_token_usage(project, tokens)
+                totals[project] = self.agent_state.get_latest_token_usage(project)
+
+        for project, total in totals.items():
+            emit_agent("tokens", {"project_name": project, "token_usage": total}, False)
+
+
+token_counter = TokenCounter()
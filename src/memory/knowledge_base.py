@@ -1,33 +1,173 @@
+import math
+import re
+import time
+from collections import Counter
+from threading import Lock
 from typing import Optional
-from sqlmodel import Field, Session, SQLModel, create_engine
 
-from src.config import Config
+from sqlmodel import Field, Session, SQLModel
+
+from src.database import get_engine
+
+# Stored knowledge (formatted research results) is looked up with BM25 over the
+# tag and the contents, so near-duplicate research queries hit the cache too.
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# the tag is what a query is compared against first, weigh it above the contents
+TAG_WEIGHT = 3
+# newest entries kept in the in-memory index, older ones are no longer matched
+MAX_INDEXED_DOCUMENTS = 2000
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "what", "with",
+}
+
+
+def normalize(token: str) -> str:
+    # crude plural folding, so "hooks" matches "hook"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [normalize(token) for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOP_WORDS]
 
-"""
-TODO: The tag check should be a BM25 search, it's just a simple equality check now.
-"""
 
 class Knowledge(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     tag: str
     contents: str
+    created_at: Optional[float] = None
+
+
+class BM25Index:
+    def __init__(self, max_documents: int = MAX_INDEXED_DOCUMENTS):
+        # knowledge id -> (term frequencies, tag terms, length, created_at), oldest first
+        self.documents = {}
+        self.document_frequencies = Counter()
+        self.total_length = 0
+        self.max_documents = max_documents
+
+    def add(self, knowledge_id: int, tag: str, contents: str, created_at: Optional[float]):
+        terms = Counter(tokenize(contents))
+        tag_terms = frozenset(tokenize(tag))
+        for term in tag_terms:
+            terms[term] += TAG_WEIGHT
+        length = sum(terms.values())
+        self.documents[knowledge_id] = (terms, tag_terms, length, created_at)
+        self.document_frequencies.update(terms.keys())
+        self.total_length += length
+        while len(self.documents) > self.max_documents:
+            self.remove(next(iter(self.documents)))
+
+    def remove(self, knowledge_id: int):
+        terms, _, length, _ = self.documents.pop(knowledge_id)
+        self.document_frequencies.subtract(terms.keys())
+        for term in terms:
+            if self.document_frequencies[term] <= 0:
+                del self.document_frequencies[term]
+        self.total_length -= length
+
+    def idf(self, term: str) -> float:
+        n = len(self.documents)
+        df = self.document_frequencies.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, min_created_at: float) -> Optional[tuple]:
+        """
+        Best `(knowledge id, relevance)` among documents created after `min_created_at`.
+        The BM25 score, divided by the score a document matching every query term
+        would saturate at, tells how much of the query the document covers. It is
+        scaled by the IDF-weighted share of the document's tag found in the query,
+        so a broad query ("python") does not match a narrow entry ("flask app").
+        Relevance stays within [0, 1).
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms or not self.documents:
+            return None
+
+        average_length = self.total_length / len(self.documents)
+        idfs = {term: self.idf(term) for term in query_terms}
+        max_score = sum(idfs.values()) * (BM25_K1 + 1)
+        if max_score <= 0:
+            return None
+
+        best = None
+        for knowledge_id, (terms, tag_terms, length, created_at) in self.documents.items():
+            if created_at is None or created_at < min_created_at:
+                continue
+            score = 0.0
+            for term in query_terms:
+                frequency = terms.get(term)
+                if frequency:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    score += idfs[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if not score:
+                continue
+            tag_weight = sum(self.idf(term) for term in tag_terms)
+            if tag_weight <= 0:
+                continue
+            tag_coverage = sum(self.idf(term) for term in tag_terms & query_terms) / tag_weight
+            relevance = score / max_score * tag_coverage
+            if best is None or relevance > best[1]:
+                best = (knowledge_id, relevance)
+
+        return best
+
+
+_index = None
+_index_lock = Lock()
+
 
 class KnowledgeBase:
     def __init__(self):
-        config = Config()
-        sqlite_path = config.get_sqlite_db()
-        self.engine = create_engine(f"sqlite:///{sqlite_path}")
-        SQLModel.metadata.create_all(self.engine)
+        self.engine = get_engine()
+
+    def _get_index(self) -> BM25Index:
+        global _index
+        with _index_lock:
+            if _index is None:
+                index = BM25Index()
+                with Session(self.engine) as session:
+                    newest = session.query(Knowledge) \
+                        .order_by(Knowledge.id.desc()) \
+                        .limit(index.max_documents) \
+                        .all()
+                    for knowledge in reversed(newest):
+                        index.add(knowledge.id, knowledge.tag, knowledge.contents, knowledge.created_at)
+                _index = index
+            return _index
 
     def add_knowledge(self, tag: str, contents: str):
-        knowledge = Knowledge(tag=tag, contents=contents)
+        knowledge = Knowledge(tag=tag, contents=contents, created_at=time.time())
         with Session(self.engine) as session:
             session.add(knowledge)
             session.commit()
+            session.refresh(knowledge)
+        index = self._get_index()
+        with _index_lock:
+            index.add(knowledge.id, knowledge.tag, knowledge.contents, knowledge.created_at)
 
     def get_knowledge(self, tag: str) -> str:
         with Session(self.engine) as session:
             knowledge = session.query(Knowledge).filter(Knowledge.tag == tag).first()
             if knowledge:
                 return knowledge.contents
-            return None
\ No newline at end of file
+            return None
+
+    def search_knowledge(self, query: str, ttl: float, min_relevance: float) -> Optional[str]:
+        """
+        Contents of the most relevant knowledge stored in the last `ttl` seconds,
+        if its relevance to `query` reaches `min_relevance`.
+        """
+        index = self._get_index()
+        with _index_lock:
+            match = index.search(query, min_created_at=time.time() - ttl)
+        if not match or match[1] < min_relevance:
+            return None
+        with Session(self.engine) as session:
+            knowledge = session.get(Knowledge, match[0])
+            return knowledge.contents if knowledge else None
@@ -1,3 +1,209 @@
 """
 Vector Search for Code Docs + Docs Loading
-"""
\ No newline at end of file
+"""
+import hashlib
+import json
+import os
+import re
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import Config
+
+# Embeddings of one namespace (a project) live in a memory-mapped float32 matrix,
+# `embeddings.npy`, next to `meta.json` which maps every row to its chunk. Vectors
+# are stored L2-normalized so cosine similarity is a plain dot product.
+
+INITIAL_CAPACITY = 256
+EMBED_BATCH_SIZE = 64
+CHUNK_LINES = 40
+CHUNK_OVERLAP = 5
+
+def get_embedding_model():
+    """
+    The sentence-transformer backend of the shared KeyBERT instance.
+    """
+    from src.bert.sentence import get_kw_model
+    return get_kw_model().model
+
+
+def embed(texts: List[str]) -> np.ndarray:
+    model = get_embedding_model()
+    batches = [
+        model.embed(texts[i:i + EMBED_BATCH_SIZE])
+        for i in range(0, len(texts), EMBED_BATCH_SIZE)
+    ]
+    vectors = np.asarray(np.concatenate(batches), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def chunk_text(text: str, lines_per_chunk: int = CHUNK_LINES, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    lines = text.splitlines()
+    if len(lines) <= lines_per_chunk:
+        return [text] if text.strip() else []
+    step = lines_per_chunk - overlap
+    return [
+        "\n".join(lines[start:start + lines_per_chunk])
+        for start in range(0, len(lines) - overlap, step)
+    ]
+
+
+class VectorIndex:
+    """
+    Embedding index of one namespace with incremental upserts and top-k cosine search.
+    Chunks are grouped by `source` (a file path, a research query, ...) so a source
+    can be re-synced as a whole.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.matrix_path = os.path.join(self.directory, "embeddings.npy")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock = Lock()
+        # (mtime, size) of every file source at its last sync, so unchanged files are skipped
+        self.file_stamps: Dict[str, tuple] = {}
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.meta_path) and os.path.exists(self.matrix_path):
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            self.rows = meta["rows"]  # row -> {"id", "source", "text", "hash"}
+            self.matrix = np.load(self.matrix_path, mmap_mode="r+")
+        else:
+            self.rows = []
+            self.matrix = None
+        self.row_of = {row["id"]: i for i, row in enumerate(self.rows)}
+
+    def _save_meta(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.meta_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"rows": self.rows}, f)
+        os.replace(temp_path, self.meta_path)
+
+    def _ensure_capacity(self, count: int, dim: int):
+        if self.matrix is not None and self.matrix.shape[0] >= count:
+            return
+        capacity = INITIAL_CAPACITY if self.matrix is None else self.matrix.shape[0]
+        while capacity < count:
+            capacity *= 2
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.matrix_path}.tmp.npy"
+        grown = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if self.matrix is not None:
+            grown[:len(self.rows)] = self.matrix[:len(self.rows)]
+        grown.flush()
+        del grown
+        self.matrix = None
+        os.replace(temp_path, self.matrix_path)
+        self.matrix = np.load(self.matrix_path, mmap_mode="r+")
+
+    def _delete_row(self, row: int):
+        # move the last row into the hole so the live rows stay contiguous
+        removed_id = self.rows[row]["id"]
+        last = len(self.rows) - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.rows[row] = self.rows[last]
+            self.row_of[self.rows[row]["id"]] = row
+        self.rows.pop()
+        del self.row_of[removed_id]
+
+    def upsert(self, chunks: List[dict]):
+        """
+        Add or replace chunks given as `{"id", "source", "text"}`. Chunks whose text
+        did not change since they were indexed are not embedded again.
+        """
+        with self.lock:
+            changed = []
+            for chunk in chunks:
+                digest = hashlib.sha1(chunk["text"].encode("utf-8")).hexdigest()
+                row = self.row_of.get(chunk["id"])
+                if row is not None and self.rows[row]["hash"] == digest:
+                    continue
+                changed.append({**chunk, "hash": digest})
+            if not changed:
+                return
+
+            vectors = embed([chunk["text"] for chunk in changed])
+            new_count = len(self.rows) + sum(1 for chunk in changed if chunk["id"] not in self.row_of)
+            self._ensure_capacity(new_count, vectors.shape[1])
+            for chunk, vector in zip(changed, vectors):
+                row = self.row_of.get(chunk["id"])
+                if row is None:
+                    row = len(self.rows)
+                    self.rows.append(None)
+                    self.row_of[chunk["id"]] = row
+                self.rows[row] = {key: chunk[key] for key in ("id", "source", "text", "hash")}
+                self.matrix[row] = vector
+            self.matrix.flush()
+            self._save_meta()
+
+    def sync_source(self, source: str, text: str):
+        """
+        Re-index a whole source: chunk it, upsert the chunks and drop the chunks it
+        no longer has.
+        """
+        chunks = [
+            {"id": f"{source}#{i}", "source": source, "text": chunk}
+            for i, chunk in enumerate(chunk_text(text))
+        ]
+        self.upsert(chunks)
+        self.remove_source(source, keep={chunk["id"] for chunk in chunks})
+
+    def remove_source(self, source: str, keep: Optional[set] = None):
+        keep = keep or set()
+        with self.lock:
+            stale = [row["id"] for row in self.rows if row["source"] == source and row["id"] not in keep]
+            if not stale:
+                return
+            for chunk_id in stale:
+                self._delete_row(self.row_of[chunk_id])
+            self.matrix.flush()
+            self._save_meta()
+
+    def sources(self) -> set:
+        return {row["source"] for row in self.rows}
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[dict]]:
+        """
+        Top-k chunks for every query, as `{"source", "text", "score"}`, in one
+        matrix product.
+        """
+        with self.lock:
+            count = len(self.rows)
+            if not count or not queries:
+                return [[] for _ in queries]
+            scores = embed(queries) @ np.asarray(self.matrix[:count]).T
+            k = min(top_k, count)
+            results = []
+            for query_scores in scores:
+                top = np.argpartition(-query_scores, k - 1)[:k]
+                top = top[np.argsort(-query_scores[top])]
+                results.append([
+                    {"source": self.rows[i]["source"], "text": self.rows[i]["text"], "score": float(query_scores[i])}
+                    for i in top
+                ])
+            return results
+
+    def search(self, query: str, top_k: int = 5) -> List[dict]:
+        return self.search_batch([query], top_k)[0]
+
+
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = Lock()
+
+
+def get_vector_index(namespace: str) -> VectorIndex:
+    """
+    The index of a namespace, shared by the whole process so that every user
+    sees the same memory map after it grows.
+    """
+    directory = os.path.join(Config().get_rag_dir(), re.sub(r"[^a-zA-Z0-9_-]+", "-", namespace.lower()))
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = VectorIndex(directory)
+        return _indexes[directory]
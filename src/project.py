@@ -1,26 +1,77 @@
 import os
 import json
+import time
 import zipfile
 from datetime import datetime
+from threading import Condition
 from typing import Optional
+from sqlalchemy import Index
 from src.socket_instance import emit_agent
-from sqlmodel import Field, Session, SQLModel, create_engine
+from sqlmodel import Field, Session, SQLModel
 from src.config import Config
+from src.database import get_engine
 
 
 class Projects(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     project: str
+    # legacy message storage, only read to migrate old databases into `ProjectMessage` rows
     message_stack_json: str
 
 
+class ProjectMessage(SQLModel, table=True):
+    __tablename__ = "project_message"
+    __table_args__ = (
+        Index("ix_project_message_project_id", "project", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project: str
+    from_devika: bool
+    message: Optional[str] = None
+    timestamp: str
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "from_devika": self.from_devika,
+            "message": self.message,
+            "timestamp": self.timestamp
+        }
+
+
+# Agents waiting for a user reply block on `_user_message_condition` instead of
+# polling the database. `_user_message_versions` counts the user messages added
+# to each project so a waiter can tell whether a new one arrived since it last
+# checked, and `_waiting_agents` counts the agents currently waiting per project.
+_user_message_condition = Condition()
+_user_message_versions = {}
+_waiting_agents = {}
+
+
 class ProjectManager:
     def __init__(self):
         config = Config()
-        sqlite_path = config.get_sqlite_db()
         self.project_path = config.get_projects_dir()
-        self.engine = create_engine(f"sqlite:///{sqlite_path}")
-        SQLModel.metadata.create_all(self.engine)
+        self.engine = get_engine()
+
+    def migrate_legacy_messages(self):
+        """
+        One-time migration of `message_stack_json` blobs into one row per message,
+        run at startup by `init_database`.
+        """
+        with Session(self.engine) as session:
+            project_states = session.query(Projects).filter(Projects.message_stack_json != "[]").all()
+            for project_state in project_states:
+                for message in json.loads(project_state.message_stack_json):
+                    session.add(ProjectMessage(
+                        project=project_state.project,
+                        from_devika=message["from_devika"],
+                        message=message["message"],
+                        timestamp=message["timestamp"]
+                    ))
+                project_state.message_stack_json = json.dumps([])
+            session.commit()
 
     def new_message(self):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -31,6 +82,15 @@ class ProjectManager:
             "timestamp": timestamp
         }
 
+    @staticmethod
+    def _messages_query(session: Session, project: str):
+        return session.query(ProjectMessage).filter(ProjectMessage.project == project)
+
+    @staticmethod
+    def _newest_first(query):
+        # ids follow insertion order; timestamps only have a one-second resolution
+        return query.order_by(ProjectMessage.id.desc())
+
     def create_project(self, project: str):
         with Session(self.engine) as session:
             project_state = Projects(project=project, message_stack_json=json.dumps([]))
@@ -42,21 +102,21 @@ class ProjectManager:
             project_state = session.query(Projects).filter(Projects.project == project).first()
             if project_state:
                 session.delete(project_state)
-                session.commit()
+            self._messages_query(session, project).delete()
+            session.commit()
 
     def add_message_to_project(self, project: str, message: dict):
         with Session(self.engine) as session:
             project_state = session.query(Projects).filter(Projects.project == project).first()
-            if project_state:
-                message_stack = json.loads(project_state.message_stack_json)
-                message_stack.append(message)
-                project_state.message_stack_json = json.dumps(message_stack)
-                session.commit()
-            else:
-                message_stack = [message]
-                project_state = Projects(project=project, message_stack_json=json.dumps(message_stack))
-                session.add(project_state)
-                session.commit()
+            if not project_state:
+                session.add(Projects(project=project, message_stack_json=json.dumps([])))
+            session.add(ProjectMessage(
+                project=project,
+                from_devika=message["from_devika"],
+                message=message["message"],
+                timestamp=message["timestamp"]
+            ))
+            session.commit()
 
     def add_message_from_devika(self, project: str, message: str):
         new_message = self.new_message()
@@ -70,41 +130,71 @@ class ProjectManager:
         new_message["from_devika"] = False
         emit_agent("server-message", {"messages": new_message})
         self.add_message_to_project(project, new_message)
-
-    def get_messages(self, project: str):
+        with _user_message_condition:
+            _user_message_versions[project] = _user_message_versions.get(project, 0) + 1
+            _user_message_condition.notify_all()
+
+    def is_waiting_for_user(self, project: str) -> bool:
+        with _user_message_condition:
+            return _waiting_agents.get(project, 0) > 0
+
+    def wait_for_user_message(self, project: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Block until the last message of the project is from the user and return it,
+        or return None once `timeout` seconds have passed without a reply.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with _user_message_condition:
+            _waiting_agents[project] = _waiting_agents.get(project, 0) + 1
+            try:
+                while True:
+                    version = _user_message_versions.get(project, 0)
+                    if self.validate_last_message_is_from_user(project):
+                        return self.get_latest_message_from_user(project)
+
+                    while _user_message_versions.get(project, 0) == version:
+                        remaining = deadline - time.monotonic() if deadline is not None else None
+                        if remaining is not None and remaining <= 0:
+                            return None
+                        _user_message_condition.wait(remaining)
+            finally:
+                _waiting_agents[project] -= 1
+
+    def get_messages(self, project: str, before: Optional[int] = None, limit: Optional[int] = None):
+        """
+        Messages of a project in chronological order. With `limit`, only the newest
+        `limit` messages older than the `before` cursor (a message id) are returned.
+        """
         with Session(self.engine) as session:
-            project_state = session.query(Projects).filter(Projects.project == project).first()
-            if project_state:
-                return json.loads(project_state.message_stack_json)
-            return None
+            query = self._messages_query(session, project)
+            if before is not None:
+                query = query.filter(ProjectMessage.id < before)
+            query = self._newest_first(query)
+            if limit is not None:
+                query = query.limit(limit)
+            return [message.to_dict() for message in reversed(query.all())]
 
     def get_latest_message_from_user(self, project: str):
         with Session(self.engine) as session:
-            project_state = session.query(Projects).filter(Projects.project == project).first()
-            if project_state:
-                message_stack = json.loads(project_state.message_stack_json)
-                for message in reversed(message_stack):
-                    if not message["from_devika"]:
-                        return message
+            query = self._messages_query(session, project).filter(ProjectMessage.from_devika == False)
+            message = self._newest_first(query).first()
+            if message:
+                return message.to_dict()
             return None
 
     def validate_last_message_is_from_user(self, project: str):
         with Session(self.engine) as session:
-            project_state = session.query(Projects).filter(Projects.project == project).first()
-            if project_state:
-                message_stack = json.loads(project_state.message_stack_json)
-                if message_stack:
-                    return not message_stack[-1]["from_devika"]
+            message = self._newest_first(self._messages_query(session, project)).first()
+            if message:
+                return not message.from_devika
             return False
 
     def get_latest_message_from_devika(self, project: str):
         with Session(self.engine) as session:
-            project_state = session.query(Projects).filter(Projects.project == project).first()
-            if project_state:
-                message_stack = json.loads(project_state.message_stack_json)
-                for message in reversed(message_stack):
-                    if message["from_devika"]:
-                        return message
+            query = self._messages_query(session, project).filter(ProjectMessage.from_devika == True)
+            message = self._newest_first(query).first()
+            if message:
+                return message.to_dict()
             return None
 
     def get_project_list(self):
@@ -115,17 +205,13 @@ class ProjectManager:
     def get_all_messages_formatted(self, project: str):
         formatted_messages = []
 
-        with Session(self.engine) as session:
-            project_state = session.query(Projects).filter(Projects.project == project).first()
-            if project_state:
-                message_stack = json.loads(project_state.message_stack_json)
-                for message in message_stack:
-                    if message["from_devika"]:
-                        formatted_messages.append(f"Devika: {message['message']}")
-                    else:
-                        formatted_messages.append(f"User: {message['message']}")
-
-            return formatted_messages
+        for message in self.get_messages(project):
+            if message["from_devika"]:
+                formatted_messages.append(f"Devika: {message['message']}")
+            else:
+                formatted_messages.append(f"User: {message['message']}")
+
+        return formatted_messages
 
     def get_project_path(self, project: str):
         return os.path.join(self.project_path, project.lower().replace(" ", "-"))
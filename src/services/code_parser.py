@@ -0,0 +1,256 @@
+"""
+The code agents answer in this format:
+
+    ~~~
+    File: `main.py`:
+    ```py
+    print("Example")
+    ```
+    ~~~
+
+`CodeParser` reads it in one pass, from whole responses or from a token
+stream, and hands out each `(file, code)` record as soon as its code block
+closes.
+"""
+import codecs
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from src.socket_instance import emit_agent
+from src.state import AgentState
+from src.filesystem.code_writer import is_search_replace, is_unified_diff
+
+FileRecord = Tuple[str, str]
+
+
+def parse_file_name(line: str) -> str:
+    name = line[len("File:"):].strip()
+    if "`" in name:
+        parts = name.split("`")
+        if len(parts) > 2:
+            return parts[1].strip()
+    return name.rstrip(":").strip("`*'\" ")
+
+
+class CodeParser:
+    def __init__(self, on_file: Optional[Callable[[str, str], None]] = None):
+        self.on_file = on_file
+        self.files: List[FileRecord] = []
+        self._taken = 0
+        self._partial: List[str] = []
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._started = False
+        self._finished = False
+        self._file: Optional[str] = None
+        self._lines: List[str] = []
+        self._fenced_lines: List[str] = []
+        self._fence_depth = 0
+        self._had_fence = False
+        # a bare ``` that may close the file or open a block nested in it
+        self._pending_fence: Optional[str] = None
+
+    def feed(self, chunk: Union[str, bytes, memoryview]) -> List[FileRecord]:
+        """
+        Consume the next piece of the response. Returns the records completed by it.
+        """
+        if not isinstance(chunk, str):
+            chunk = self._decoder.decode(chunk)
+        if "\n" not in chunk:
+            # Most stream tokens: nothing completes until the end of the line
+            if not self._finished:
+                self._partial.append(chunk)
+            return []
+        if self._partial:
+            self._partial.append(chunk)
+            chunk = "".join(self._partial)
+            self._partial = []
+        end = chunk.rfind("\n")
+        tail = chunk[end + 1:]
+        if tail and not self._finished:
+            self._partial.append(tail)
+
+        pos = 0
+        while pos <= end and not self._finished:
+            if self._fence_depth:
+                # Fast path for the bulk of the response: every line of code up to
+                # the next fence is taken in one slice and split
+                fence = chunk.find("```", pos, end)
+                stop = end + 1 if fence == -1 else chunk.rfind("\n", pos, fence) + 1
+                if stop > pos:
+                    block = chunk[pos:stop - 1]
+                    if "\r" in block:
+                        self._fenced_lines.extend(line[:-1] if line.endswith("\r") else line
+                                                  for line in block.split("\n"))
+                    elif "\n" in block:
+                        self._fenced_lines.extend(block.split("\n"))
+                    else:
+                        self._fenced_lines.append(block)
+                    pos = stop
+                    continue
+            newline = chunk.find("\n", pos)
+            self._line(chunk[pos:newline])
+            pos = newline + 1
+        return self._take()
+
+    def close(self) -> List[FileRecord]:
+        """
+        End of the response: flush the last line and the file still open.
+        """
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self._partial.append(tail)
+        if self._partial and not self._finished:
+            line = "".join(self._partial)
+            self._partial = []
+            self._line(line)
+        if self._fence_depth > 0:
+            # The last block was never closed: the closing ~~~ was read as code
+            while self._fenced_lines and self._fenced_lines[-1].strip() in ("", "~~~"):
+                self._fenced_lines.pop()
+        self._end_file()
+        self._finished = True
+        return self._take()
+
+    def _take(self) -> List[FileRecord]:
+        records = self.files[self._taken:]
+        self._taken = len(self.files)
+        return records
+
+    def _line(self, line: str):
+        if line.endswith("\r"):
+            line = line[:-1]
+        stripped = line.strip()
+
+        if not self._started:
+            if stripped.startswith("~~~"):
+                self._started = True
+            return
+
+        if self._pending_fence is not None:
+            fence = self._pending_fence
+            self._pending_fence = None
+            if stripped == "" or stripped.startswith("~~~") or line.startswith("File:"):
+                self._end_file()
+            else:
+                # it opened a bare block inside the file, e.g. an example in a README
+                self._fence_depth = 2
+                self._fenced_lines.append(fence)
+
+        if self._fence_depth == 0:
+            if stripped == "~~~":
+                self._end_file()
+                self._finished = True
+                return
+            if line.startswith("File:"):
+                self._end_file()
+                self._file = parse_file_name(line)
+                return
+
+        if self._file is None:
+            return
+
+        if stripped.startswith("```"):
+            if self._fence_depth > 0 and stripped == "```":
+                self._fence_depth -= 1
+                if self._fence_depth == 0:
+                    # Only a closing fence if the file ends there; the next line tells.
+                    # Depth 0 meanwhile keeps that line off the fast path of `feed`.
+                    self._pending_fence = line
+                    return
+            else:
+                self._fence_depth += 1
+                self._had_fence = True
+                if self._fence_depth == 1:
+                    return
+            # A fence nested in the file, e.g. an example inside a README
+            self._fenced_lines.append(line)
+            return
+
+        if self._fence_depth > 0:
+            self._fenced_lines.append(line)
+        else:
+            self._lines.append(line)
+
+    def _end_file(self):
+        if self._file is not None:
+            # Without any fence the model wrote the code bare; keep all its lines
+            lines = self._fenced_lines if self._had_fence else self._lines
+            if lines and self._file:
+                code = "\n".join(lines)
+                self.files.append((self._file, code))
+                if self.on_file:
+                    self.on_file(self._file, code)
+        self._file = None
+        self._lines = []
+        self._fenced_lines = []
+        self._fence_depth = 0
+        self._had_fence = False
+        self._pending_fence = None
+
+
+def parse_code_response(response: Union[str, bytes, memoryview]) -> List[Dict[str, str]]:
+    parser = CodeParser()
+    parser.feed(response)
+    parser.close()
+    return [{"file": file, "code": code} for file, code in parser.files]
+
+
+class CodeFileStream:
+    """
+    `on_token` callback for the code agents: every complete file of the
+    response streams to the UI as a `code-file` event while the model is
+    still writing the next one. Edits (SEARCH/REPLACE, diffs) are held back
+    until they have been applied.
+    """
+    def __init__(self, project_name: str, source: str):
+        self.project_name = project_name
+        self.source = source
+        self.emitted: Dict[str, str] = {}
+        self.parser = CodeParser(on_file=self.emit)
+
+    def __call__(self, token: str):
+        self.parser.feed(token)
+
+    def emit(self, file: str, code: str):
+        if is_search_replace(code) or is_unified_diff(code):
+            return
+        emit_agent("code-file", {
+            "project_name": self.project_name,
+            "file": file,
+            "code": code,
+            "from": self.source,
+            "index": len(self.emitted),
+            "total": None
+        }, log=False)
+        self.emitted[file] = code
+
+
+def emulate_code_writing(code_set: List[dict], project_name: str, source: str,
+                         streamed: Optional[Dict[str, str]] = None, keep_browser_session: bool = False):
+    """
+    Push every file written by the `source` agent to the UI once, as its own
+    `code-file` event, then record the whole set as a single state entry. Files
+    already `streamed` to the UI with the same contents are not sent again.
+    """
+    streamed = streamed or {}
+    pending = [f for f in code_set if streamed.get(f["file"]) != f["code"]]
+    for index, current_file in enumerate(pending, start=len(streamed)):
+        emit_agent("code-file", {
+            "project_name": project_name,
+            "file": current_file["file"],
+            "code": current_file["code"],
+            "from": source,
+            "index": index,
+            "total": len(code_set)
+        }, log=False)
+
+    files = [current_file["file"] for current_file in code_set]
+    new_state = AgentState().new_state()
+    if keep_browser_session:
+        current_state = AgentState().get_latest_state(project_name)
+        if current_state:
+            new_state["browser_session"] = current_state["browser_session"]
+    new_state["internal_monologue"] = "Writing code..."
+    new_state["terminal_session"]["title"] = f"Editing {len(files)} files"
+    new_state["terminal_session"]["command"] = f"vim {' '.join(files)}"
+    new_state["terminal_session"]["output"] = "\n".join(files)
+    AgentState().add_to_current_state(project_name, new_state)
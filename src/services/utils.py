@@ -1,12 +1,20 @@
 # create wrapper function that will has retry logic of 5 times
-import sys
+import re
 import time
 from functools import wraps
 import json
 
 from src.socket_instance import emit_agent
+from src.llm.cache import discard_last_response
+from src.llm.resilience import backoff_delay
+
+
+class InvalidResponseError(Exception):
+    pass
+
 
 def retry_wrapper(func):
+    @wraps(func)
     def wrapper(*args, **kwargs):
         max_tries = 5
         tries = 0
@@ -14,20 +22,66 @@ def retry_wrapper(func):
             result = func(*args, **kwargs)
             if result:
                 return result
+            # don't let the retry get the same rejected response back from the cache
+            discard_last_response()
             print("Invalid response from the model, I'm trying again...")
             emit_agent("info", {"type": "warning", "message": "Invalid response from the model, trying again..."})
+            time.sleep(backoff_delay(tries))
             tries += 1
-            time.sleep(2)
         print("Maximum 5 attempts reached. try other models")
         emit_agent("info", {"type": "error", "message": "Maximum attempts reached. model keeps failing."})
-        sys.exit(1)
-
-        return False
+        raise InvalidResponseError(f"{func.__qualname__}: no valid response after {max_tries} attempts")
     return wrapper
 
-        
-class InvalidResponseError(Exception):
-    pass
+
+def repair_json(text: str):
+    """
+    Fix the usual ways models break JSON (missing or trailing commas, Python
+    literals, raw newlines in strings, a response cut off mid-object) so that
+    an almost valid response does not cost a whole new inference.
+    Returns the parsed value, or None when it is beyond repair.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+    text = text[min(starts):]
+
+    text = re.sub(r'(["\]}\d]|\btrue|\bfalse|\bnull)(\s*\n\s*)(["{\[])', r'\1,\2\3', text)
+    text = re.sub(r'([:\[,]\s*)True\b', r'\1true', text)
+    text = re.sub(r'([:\[,]\s*)False\b', r'\1false', text)
+    text = re.sub(r'([:\[,]\s*)None\b', r'\1null', text)
+
+    # Keep the first top-level value; close whatever a truncated one left open
+    closers = []
+    in_string = escaped = False
+    end = len(text)
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+            if not closers:
+                end = i + 1
+                break
+    text = text[:end]
+    if in_string:
+        text += '"'
+    text += "".join(reversed(closers))
+    text = re.sub(r',(\s*[}\]])', r'\1', text)
+
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return None
 
 def validate_responses(func):
     @wraps(func)
@@ -35,6 +89,7 @@ def validate_responses(func):
         args = list(args)
         response = args[1]
         response = response.strip()
+        raw_response = response
 
         try:
             response = json.loads(response)
@@ -82,6 +137,11 @@ def validate_responses(func):
             except json.JSONDecodeError:
                 pass
 
+        repaired = repair_json(raw_response)
+        if repaired is not None:
+            args[1] = repaired
+            return func(*args, **kwargs)
+
         # If all else fails, raise an exception
         emit_agent("info", {"type": "error", "message": "Failed to parse response as JSON"})
         # raise InvalidResponseError("Failed to parse response as JSON")
@@ -1,16 +1,24 @@
 # socketio_instance.py
+import reprlib
+
 from flask_socketio import SocketIO
 from src.logger import Logger
 socketio = SocketIO(cors_allowed_origins="*", async_mode="gevent")
 
 logger = Logger()
 
+# payloads can carry whole files and terminal outputs; only log a bounded summary
+_payload_repr = reprlib.Repr()
+_payload_repr.maxstring = 200
+_payload_repr.maxother = 200
+_payload_repr.maxlevel = 3
+
 
 def emit_agent(channel, content, log=True):
     try:
         socketio.emit(channel, content)
         if log:
-            logger.info(f"SOCKET {channel} MESSAGE: {content}")
+            logger.info(f"SOCKET {channel} MESSAGE: {_payload_repr.repr(content)}")
         return True
     except Exception as e:
         logger.error(f"SOCKET {channel} ERROR: {str(e)}")
@@ -1,13 +1,24 @@
+import atexit
+import copy
 import json
 import os
+import time
 from datetime import datetime
-from typing import Optional
-from sqlmodel import Field, Session, SQLModel, create_engine
+from threading import RLock, Thread
+from typing import Callable, Optional, Tuple
+from sqlalchemy import Index
+from sqlmodel import Field, Session, SQLModel
 from src.socket_instance import emit_agent
 from src.config import Config
+from src.database import get_engine
+from src.filesystem.file_index import get_file_index
 
 
 class AgentStateModel(SQLModel, table=True):
+    """
+    Legacy storage: the whole state stack serialized into a single row.
+    Only read to migrate old databases into `AgentStateEntry` rows.
+    """
     __tablename__ = "agent_state"
 
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -15,12 +26,93 @@ class AgentStateModel(SQLModel, table=True):
     state_stack_json: str
 
 
+class AgentStateEntry(SQLModel, table=True):
+    __tablename__ = "agent_state_entry"
+    __table_args__ = (
+        Index("ix_agent_state_entry_project_seq", "project", "seq", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project: str
+    seq: int
+    state_json: str
+
+
+# Process-wide cache of the latest state entry of each project, as `(seq, state)`.
+# `(0, None)` marks a project that has no state yet. Every `AgentState` write goes
+# through the cache first, so polling endpoints never touch the database.
+#
+# With write-behind enabled, writes are buffered in `_pending_writes` (keyed by
+# sequence number, so repeated updates of the latest entry coalesce into one row
+# write) and flushed periodically by a background thread.
+_latest_states = {}
+_pending_writes = {}
+_state_lock = RLock()
+_flusher = None
+
+
 class AgentState:
     def __init__(self):
         config = Config()
-        sqlite_path = config.get_sqlite_db()
-        self.engine = create_engine(f"sqlite:///{sqlite_path}")
-        SQLModel.metadata.create_all(self.engine)
+        self.write_behind = config.get_state_write_behind()
+        self.flush_interval = config.get_state_flush_interval()
+        self.engine = get_engine()
+        if self.write_behind:
+            self._start_flusher()
+
+    def migrate_legacy_states(self):
+        """
+        One-time migration of `state_stack_json` blobs into one row per state entry,
+        run at startup by `init_database`.
+        """
+        with Session(self.engine) as session:
+            legacy_states = session.query(AgentStateModel).order_by(AgentStateModel.id).all()
+            for legacy_state in legacy_states:
+                latest = self._get_latest_entry(session, legacy_state.project)
+                seq = latest.seq if latest else 0
+                for state in json.loads(legacy_state.state_stack_json):
+                    seq += 1
+                    session.add(AgentStateEntry(
+                        project=legacy_state.project,
+                        seq=seq,
+                        state_json=json.dumps(state)
+                    ))
+                session.delete(legacy_state)
+                # flush so the next blob of the same project sees the new sequence numbers
+                session.flush()
+            session.commit()
+
+    def _start_flusher(self):
+        global _flusher
+        with _state_lock:
+            if _flusher is not None:
+                return
+            _flusher = Thread(target=self._flush_periodically, daemon=True)
+            _flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing agent state: {e}")
+
+    def flush(self, project: str = None):
+        """
+        Persist buffered write-behind entries, for one project or for all of them.
+        """
+        with _state_lock:
+            projects = [project] if project else list(_pending_writes.keys())
+            pending = [(name, _pending_writes.pop(name)) for name in projects if name in _pending_writes]
+            if not pending:
+                return
+            with Session(self.engine) as session:
+                for name, entries in pending:
+                    for seq, state in entries.items():
+                        self._persist_entry(session, name, seq, state)
+                session.commit()
 
     def new_state(self):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -44,136 +136,165 @@ class AgentState:
             "timestamp": timestamp
         }
 
+    @staticmethod
+    def _get_latest_entry(session: Session, project: str) -> Optional[AgentStateEntry]:
+        return session.query(AgentStateEntry) \
+            .filter(AgentStateEntry.project == project) \
+            .order_by(AgentStateEntry.seq.desc()) \
+            .first()
+
+    @staticmethod
+    def _persist_entry(session: Session, project: str, seq: int, state: dict):
+        entry = session.query(AgentStateEntry) \
+            .filter(AgentStateEntry.project == project, AgentStateEntry.seq == seq) \
+            .first()
+        if entry:
+            entry.state_json = json.dumps(state)
+        else:
+            session.add(AgentStateEntry(project=project, seq=seq, state_json=json.dumps(state)))
+
+    def _load_latest(self, project: str) -> Tuple[int, Optional[dict]]:
+        with _state_lock:
+            cached = _latest_states.get(project)
+            if cached is not None:
+                return cached
+            with Session(self.engine) as session:
+                latest = self._get_latest_entry(session, project)
+                if latest:
+                    cached = (latest.seq, json.loads(latest.state_json))
+                else:
+                    cached = (0, None)
+            _latest_states[project] = cached
+            return cached
+
+    def _write_entry(self, project: str, seq: int, state: dict):
+        state = copy.deepcopy(state)
+        with _state_lock:
+            _latest_states[project] = (seq, state)
+            if self.write_behind:
+                _pending_writes.setdefault(project, {})[seq] = state
+                return
+            with Session(self.engine) as session:
+                self._persist_entry(session, project, seq, state)
+                session.commit()
+
+    def _append_state(self, project: str, state: dict) -> int:
+        with _state_lock:
+            seq, _ = self._load_latest(project)
+            self._write_entry(project, seq + 1, state)
+            return seq + 1
+
+    def _update_latest(self, project: str, update: Callable[[dict], None], default: Callable[[], dict]) -> Tuple[int, dict]:
+        with _state_lock:
+            seq, latest = self._load_latest(project)
+            seq = max(seq, 1)
+            state = copy.deepcopy(latest) if latest else default()
+            update(state)
+            self._write_entry(project, seq, state)
+            return seq, state
+
+    @staticmethod
+    def emit_state(project: str, seq: int, state: dict):
+        """
+        Emit a single new or changed entry. Clients apply it on top of the entry
+        with the same `seq` (update) or append it (`seq` is one past their last);
+        on a gap they resync through `get_states_since`.
+        """
+        emit_agent("agent-state", {"project_name": project, "seq": seq, "state": state})
+
     def create_state(self, project: str):
-        with Session(self.engine) as session:
-            new_state = self.new_state()
-            new_state["step"] = 1
-            new_state["internal_monologue"] = "I'm starting the work..."
-            agent_state = AgentStateModel(project=project, state_stack_json=json.dumps([new_state]))
-            session.add(agent_state)
-            session.commit()
-            emit_agent("agent-state", [new_state])
+        new_state = self.new_state()
+        new_state["step"] = 1
+        new_state["internal_monologue"] = "I'm starting the work..."
+        seq = self._append_state(project, new_state)
+        self.emit_state(project, seq, new_state)
 
     def delete_state(self, project: str):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).all()
-            if agent_state:
-                for state in agent_state:
-                    session.delete(state)
+        with _state_lock:
+            _pending_writes.pop(project, None)
+            _latest_states.pop(project, None)
+            with Session(self.engine) as session:
+                session.query(AgentStateEntry).filter(AgentStateEntry.project == project).delete()
+                session.query(AgentStateModel).filter(AgentStateModel.project == project).delete()
                 session.commit()
 
     def add_to_current_state(self, project: str, state: dict):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack.append(state)
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [state]
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        seq = self._append_state(project, state)
+        self.emit_state(project, seq, state)
 
     def get_current_state(self, project: str):
+        self.flush(project)
         with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                return json.loads(agent_state.state_stack_json)
+            entries = session.query(AgentStateEntry) \
+                .filter(AgentStateEntry.project == project) \
+                .order_by(AgentStateEntry.seq) \
+                .all()
+            if entries:
+                return [json.loads(entry.state_json) for entry in entries]
             return None
 
-    def update_latest_state(self, project: str, state: dict):
+    def get_states_since(self, project: str, since_seq: int = 0) -> list:
+        self.flush(project)
         with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1] = state
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [state]
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+            entries = session.query(AgentStateEntry) \
+                .filter(AgentStateEntry.project == project, AgentStateEntry.seq > since_seq) \
+                .order_by(AgentStateEntry.seq) \
+                .all()
+            return [{"seq": entry.seq, "state": json.loads(entry.state_json)} for entry in entries]
+
+    def update_latest_state(self, project: str, state: dict):
+        with _state_lock:
+            seq, _ = self._load_latest(project)
+            seq = max(seq, 1)
+            self._write_entry(project, seq, state)
+        self.emit_state(project, seq, state)
 
     def get_latest_state(self, project: str):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                return json.loads(agent_state.state_stack_json)[-1]
-            return None
+        _, latest = self._load_latest(project)
+        return copy.deepcopy(latest)
+
+    def get_latest_seq(self, project: str) -> int:
+        seq, _ = self._load_latest(project)
+        return seq
 
     def set_agent_active(self, project: str, is_active: bool):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1]["agent_is_active"] = is_active
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [self.new_state()]
-                state_stack[-1]["agent_is_active"] = is_active
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        def update(state):
+            state["agent_is_active"] = is_active
+
+        seq, state = self._update_latest(project, update, self.new_state)
+        self.emit_state(project, seq, state)
 
     def is_agent_active(self, project: str):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                return json.loads(agent_state.state_stack_json)[-1]["agent_is_active"]
-            return None
+        _, latest = self._load_latest(project)
+        if latest:
+            return latest["agent_is_active"]
+        return None
 
     def set_agent_completed(self, project: str, is_completed: bool):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1]["internal_monologue"] = "Agent has completed the task."
-                state_stack[-1]["completed"] = is_completed
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [self.new_state()]
-                state_stack[-1]["completed"] = is_completed
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        def update(state):
+            state["internal_monologue"] = "Agent has completed the task."
+            state["completed"] = is_completed
+
+        seq, state = self._update_latest(project, update, self.new_state)
+        self.emit_state(project, seq, state)
 
     def is_agent_completed(self, project: str):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                return json.loads(agent_state.state_stack_json)[-1]["completed"]
-            return None
-            
+        _, latest = self._load_latest(project)
+        if latest:
+            return latest["completed"]
+        return None
+
     def update_token_usage(self, project: str, token_usage: int):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1]["token_usage"] += token_usage
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [self.new_state()]
-                state_stack[-1]["token_usage"] = token_usage
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
+        def update(state):
+            state["token_usage"] += token_usage
+
+        self._update_latest(project, update, self.new_state)
 
     def get_latest_token_usage(self, project: str):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                return json.loads(agent_state.state_stack_json)[-1]["token_usage"]
-            return 0
+        _, latest = self._load_latest(project)
+        if latest:
+            return latest["token_usage"]
+        return 0
 
     def get_project_files(self, project_name: str):
         if not project_name:
@@ -182,20 +303,7 @@ class AgentState:
         directory = os.path.join(os.getcwd(), 'data', 'projects', project_directory) 
         if(not os.path.exists(directory)):
             return []
-        files = []
-        for root, _, filenames in os.walk(directory):
-            for filename in filenames:
-                file_relative_path = os.path.relpath(root, directory)
-                if file_relative_path == '.': file_relative_path = ''
-                file_path = os.path.join(file_relative_path, filename)
-                print("file_path",file_path)
-                try:
-                    with open(os.path.join(root, filename), 'r') as file:
-                        print("File:", filename)
-                        files.append({
-                            "file": file_path,
-                            "code": file.read()
-                        })
-                except Exception as e:
-                    print(f"Error reading file {filename}: {e}")
-        return files
\ No newline at end of file
+        return [
+            {"file": file["relative_path"], "code": file["code"]}
+            for file in get_file_index(directory).files()
+        ]
\ No newline at end of file
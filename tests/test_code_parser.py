@@ -0,0 +1,42 @@
+from src.services.code_parser import CodeParser, parse_code_response
+
+README_RESPONSE = """~~~
+File: `README.md`:
+```md
+# App
+
+Run:
+```
+python app.py
+```
+
+Done.
+```
+
+File: `app.py`:
+```py
+print("app")
+```
+~~~"""
+
+README_CODE = "# App\n\nRun:\n```\npython app.py\n```\n\nDone."
+
+
+def test_bare_fence_nested_in_a_file_is_kept():
+    assert parse_code_response(README_RESPONSE) == [
+        {"file": "README.md", "code": README_CODE},
+        {"file": "app.py", "code": 'print("app")'},
+    ]
+
+
+def test_bare_fence_nested_in_a_streamed_file_is_kept():
+    parser = CodeParser()
+    for i in range(0, len(README_RESPONSE), 3):
+        parser.feed(README_RESPONSE[i:i + 3])
+    parser.close()
+    assert parser.files == [("README.md", README_CODE), ("app.py", 'print("app")')]
+
+
+def test_closing_fence_at_the_end_of_the_response():
+    response = "~~~\nFile: `main.py`:\n```py\nprint(1)\n```"
+    assert parse_code_response(response) == [{"file": "main.py", "code": "print(1)"}]
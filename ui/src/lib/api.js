@@ -88,6 +88,19 @@ export async function fetchAgentState() {
   });
   const data = await response.json();
   agentState.set(data.state);
+  return data.seq;
+}
+
+export async function fetchAgentStateSince(projectName, sinceSeq) {
+  const response = await fetch(`${API_BASE_URL}/api/get-agent-state-since`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ project_name: projectName, since_seq: sinceSeq }),
+  });
+  const data = await response.json();
+  return data.entries;
 }
 
 export async function executeAgent(prompt) {
@@ -1,9 +1,20 @@
-import { socket } from "./api";
-import { messages, agentState, isSending, tokenUsage } from "./store";
+import { socket, fetchAgentStateSince } from "./api";
+import { messages, agentState, isSending, tokenUsage, streamedResponse } from "./store";
 import { toast } from "svelte-sonner";
 import { get } from "svelte/store";
 
 let prevMonologue = null;
+// last agent-state sequence number applied, per project
+let agentStateSeqs = {};
+// characters of the streamed response kept for display
+const STREAM_DISPLAY_LIMIT = 4000;
+
+function applyAgentState(state) {
+  agentState.set(state);
+  if (state.completed) {
+    isSending.set(false);
+  }
+}
 
 export function initializeSockets() {
 
@@ -20,13 +31,28 @@ export function initializeSockets() {
   socket.on("server-message", function (data) {
     console.log(data)
     messages.update((msgs) => [...msgs, data["messages"]]);
+    streamedResponse.set("");
   });
 
-  socket.on("agent-state", function (state) {
-    const lastState = state[state.length - 1];
-    agentState.set(lastState);
-    if (lastState.completed) {
-      isSending.set(false);
+  socket.on("agent-state", async function (delta) {
+    const projectName = delta.project_name;
+    if (projectName !== localStorage.getItem("selectedProject")) {
+      return;
+    }
+    const lastSeq = agentStateSeqs[projectName];
+    if (lastSeq !== undefined && delta.seq > lastSeq + 1) {
+      // missed some entries, resync from the last one we applied
+      const entries = await fetchAgentStateSince(projectName, lastSeq);
+      if (entries.length > 0) {
+        const latest = entries[entries.length - 1];
+        agentStateSeqs[projectName] = Math.max(latest.seq, delta.seq);
+        applyAgentState(latest.seq > delta.seq ? latest.state : delta.state);
+        return;
+      }
+    }
+    if (lastSeq === undefined || delta.seq >= lastSeq || delta.seq === 1) {
+      agentStateSeqs[projectName] = delta.seq;
+      applyAgentState(delta.state);
     }
   });
 
@@ -40,6 +66,13 @@ export function initializeSockets() {
       isSending.set(false);
     } else if (error["type"] == "warning") {
       toast.warning(error["message"]);
+    } else if (error["type"] == "stream") {
+      if (error["project_name"] !== localStorage.getItem("selectedProject")) {
+        return;
+      }
+      streamedResponse.update((text) =>
+        ((error["new"] ? "" : text) + error["tokens"]).slice(-STREAM_DISPLAY_LIMIT)
+      );
     }
   });
 
@@ -43,6 +43,8 @@ export const searchEngineList = writable([]);
 // Agent related stores
 export const agentState = writable(null);
 export const isSending = writable(false);
+// Tokens of the response currently streamed by the model
+export const streamedResponse = writable("");
 
 // Token usage store
 export const tokenUsage = writable(0);